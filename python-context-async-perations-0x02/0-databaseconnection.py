@@ -5,6 +5,21 @@ Task 0: Custom class-based context manager for DB connection.
 
 import sqlite3
 import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Applied once when a pooled connection is opened, not on every checkout
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+)
 
 
 class DatabaseConnection:
@@ -29,6 +44,210 @@ class DatabaseConnection:
         return False  # don’t suppress exceptions
 
 
+def _caller_stack(limit: int = 7) -> list:
+    """
+    (filename, lineno, name, line) of the frames above our caller, outermost first.
+    Walking frames is cheap enough for every checkout; source lines are looked up
+    only if the stack is formatted for a leak report.
+    """
+    frame = sys._getframe(2)
+    stack = []
+    while frame is not None and len(stack) < limit:
+        stack.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class ConnectionPool:
+    """
+    Bounded pool of warm SQLite connections to one database file.
+
+    Connections are opened lazily up to `max_size`; PRAGMAs run once per connection
+    and its prepared-statement cache survives between checkouts. When all connections
+    are checked out, acquire() blocks up to `timeout` seconds, then raises TimeoutError.
+    A connection held longer than `leak_timeout` seconds is reported as a leak,
+    together with the stack that checked it out.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 5, pragmas=DEFAULT_PRAGMAS,
+                 timeout: float = 30.0, leak_timeout: float = 60.0,
+                 cached_statements: int = 128):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = tuple(pragmas)
+        self.timeout = timeout
+        self.leak_timeout = leak_timeout
+        self.cached_statements = cached_statements
+        self._idle = deque()
+        self._checked_out: Dict[int, tuple] = {}   # id(conn) -> (conn, since, stack)
+        self._leaked = set()                        # ids already reported as leaks
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0,
+                       "timeouts": 0, "leaks": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Pooled connections move between threads, one user at a time
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """Check out a connection, waiting up to `timeout` (default: pool timeout)."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        leaks = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("ConnectionPool is closed")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._created < self.max_size:
+                        # Reserve the slot, then connect outside the lock
+                        self._created += 1
+                        conn = None
+                        break
+                    if not waited:
+                        waited = True
+                        self._stats["waits"] += 1
+                        leaks = self._collect_leaks()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise TimeoutError(
+                            f"no connection to {self.db_path} free after {timeout}s "
+                            f"(max_size={self.max_size})")
+                    self._cond.wait(remaining)
+        finally:
+            self._log_leaks(leaks)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        with self._cond:
+            if waited:
+                self._stats["wait_seconds"] += timeout - max(0.0, deadline - time.monotonic())
+            self._stats["checkouts"] += 1
+            self._checked_out[id(conn)] = (conn, time.monotonic(), _caller_stack())
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection, rolling back any open transaction first."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Unusable: drop it and let the slot be refilled with a fresh connection
+            with self._cond:
+                self._checked_out.pop(id(conn), None)
+                self._leaked.discard(id(conn))
+                self._created -= 1
+                self._cond.notify()
+            conn.close()
+            return
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+            self._leaked.discard(id(conn))
+            if self._closed:
+                self._created -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def _collect_leaks(self) -> list:
+        # Caller holds self._cond
+        now = time.monotonic()
+        held = []
+        for key, (_, since, stack) in self._checked_out.items():
+            if now - since > self.leak_timeout and key not in self._leaked:
+                self._leaked.add(key)
+                held.append((now - since, stack))
+        self._stats["leaks"] += len(held)
+        return held
+
+    def _log_leaks(self, held: list) -> None:
+        for seconds, stack in held:
+            logger.warning("connection to %s held for %.1fs, checked out at:\n%s",
+                           self.db_path, seconds, "".join(traceback.format_list(stack)))
+
+    def check_leaks(self) -> list:
+        """Log and return (seconds held, checkout stack) for new connections held past leak_timeout."""
+        with self._cond:
+            held = self._collect_leaks()
+        self._log_leaks(held)
+        return held
+
+    def stats(self) -> dict:
+        """Pool metrics: size, in_use, idle, checkouts, waits, wait_seconds, timeouts, leaks."""
+        with self._cond:
+            return dict(self._stats, size=self._created, in_use=len(self._checked_out),
+                        idle=len(self._idle), max_size=self.max_size)
+
+    def close(self) -> None:
+        """Close idle connections now and checked-out ones when they are released."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+            self._cond.notify_all()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Process-wide pool for `db_path`, sized by DB_POOL_SIZE (default 5)."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(
+                db_path, max_size=int(os.getenv("DB_POOL_SIZE", "5")))
+        return pool
+
+
+class PooledDatabaseConnection(DatabaseConnection):
+    """
+    DatabaseConnection backed by a ConnectionPool: `with` checks out a warm
+    connection, and on exit commits (or rolls back on error) and returns it.
+    """
+
+    def __init__(self, db_path: str, pool: Optional[ConnectionPool] = None):
+        super().__init__(db_path)
+        self.pool = pool or get_pool(db_path)
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        conn, self.conn = self.conn, None
+        if conn:
+            try:
+                if exc_type is None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            finally:
+                self.pool.release(conn)
+        return False
+
+
 if __name__ == "__main__":
     db_path = os.getenv("DB_PATH", "users.db")
     with DatabaseConnection(db_path) as conn:
@@ -37,3 +256,9 @@ if __name__ == "__main__":
         rows = cursor.fetchall()
         for row in rows:
             print(dict(row))
+
+    # Pooled: repeated short blocks reuse one warm connection
+    for _ in range(3):
+        with PooledDatabaseConnection(db_path) as conn:
+            conn.execute("SELECT COUNT(*) FROM users").fetchone()
+    print(get_pool(db_path).stats())
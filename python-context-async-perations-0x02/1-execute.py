@@ -5,27 +5,57 @@ Task 1: Reusable Query Context Manager.
 
 import sqlite3
 import os
+from typing import Iterator
+
+
+def _iter_rows(cursor: sqlite3.Cursor, chunk_size: int) -> Iterator:
+    """Yield rows from `cursor`, fetching `chunk_size` at a time."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
 
 
 class ExecuteQuery:
-    """Context manager that executes a given query with parameters."""
+    """
+    Context manager that executes a given query with parameters.
 
-    def __init__(self, db_path: str, query: str, params=None):
+    By default the `with` target is the full result list. With stream=True it is
+    a lazy iterator that fetches `chunk_size` rows at a time, so memory stays flat
+    and the first row is available immediately; it is closed on exit.
+    tuples=True returns plain tuples instead of sqlite3.Row objects.
+    """
+
+    def __init__(self, db_path: str, query: str, params=None,
+                 stream: bool = False, chunk_size: int = 500, tuples: bool = False):
         self.db_path = db_path
         self.query = query
         self.params = params or ()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.tuples = tuples
         self.conn = None
+        self.cursor = None
         self.results = None
 
     def __enter__(self):
         self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        cursor = self.conn.cursor()
-        cursor.execute(self.query, self.params)
-        self.results = cursor.fetchall()
+        if not self.tuples:
+            self.conn.row_factory = sqlite3.Row
+        self.cursor = self.conn.cursor()
+        self.cursor.execute(self.query, self.params)
+        if self.stream:
+            self.results = _iter_rows(self.cursor, self.chunk_size)
+        else:
+            self.results = self.cursor.fetchall()
         return self.results
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if self.stream and self.results is not None:
+            self.results.close()
+        if self.cursor:
+            self.cursor.close()
         if self.conn:
             if exc_type is None:
                 self.conn.commit()
@@ -42,3 +72,8 @@ if __name__ == "__main__":
     with ExecuteQuery(db_path, query, params) as results:
         for row in results:
             print(dict(row))
+
+    # Same query, streamed: rows are fetched in chunks as the loop consumes them
+    with ExecuteQuery(db_path, query, params, stream=True, tuples=True) as rows:
+        for row in rows:
+            print(row)
@@ -4,19 +4,343 @@ Task 2: Concurrent Asynchronous Database Queries using aiosqlite.
 """
 
 import os
+import re
+import time
 import asyncio
+import operator
 import aiosqlite
+from contextlib import asynccontextmanager
+from typing import (AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Sequence,
+                    Tuple)
 
-async def asyncfetchusers(db_path: str):
-    """Fetch all users asynchronously."""
+# Applied once when the pool opens a connection
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+)
+
+
+class AsyncConnectionPool:
+    """
+    Bounded pool of aiosqlite connections shared by many coroutines.
+
+    Each aiosqlite connection runs on its own background thread, so opening one
+    per query costs a thread start and a connect. The pool opens at most
+    `max_size` connections lazily and hands them out with `async with
+    pool.acquire() as db`; extra coroutines wait for a free one.
+    fetchall()/fetchone()/execute() acquire, run and release in one call, so
+    they can be passed straight to asyncio.gather.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 4, pragmas=DEFAULT_PRAGMAS):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = tuple(pragmas)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._all: List[aiosqlite.Connection] = []
+        self._created = 0
+        self._closed = False
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.db_path)
+        db.row_factory = aiosqlite.Row
+        for name, value in self.pragmas:
+            await db.execute(f"PRAGMA {name}={value}")
+        return db
+
+    async def _checkout(self) -> aiosqlite.Connection:
+        while True:
+            if self._closed:
+                raise RuntimeError("AsyncConnectionPool is closed")
+            if self._idle.empty() and self._created < self.max_size:
+                # Reserve the slot before awaiting so concurrent callers cannot overshoot
+                self._created += 1
+                try:
+                    db = await self._connect()
+                except BaseException:
+                    self._created -= 1
+                    raise
+                self._all.append(db)
+                return db
+            db = await self._idle.get()
+            if db is not None:
+                return db
+            # None marks a slot freed by _discard: loop to open a fresh connection
+
+    async def _discard(self, db: aiosqlite.Connection) -> None:
+        """Close a connection that must not be reused, freeing its slot for a new one."""
+        if db in self._all:
+            self._all.remove(db)
+            self._created -= 1
+            # Wake one waiter (if any) so it opens the replacement
+            self._idle.put_nowait(None)
+        try:
+            await db.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Check out a connection for the block; uncommitted work is rolled back on return."""
+        db = await self._checkout()
+        try:
+            yield db
+        finally:
+            if self._closed:
+                await self._discard(db)
+            else:
+                try:
+                    if db.in_transaction:
+                        await db.rollback()
+                except Exception:
+                    # Its state is unknown: drop it rather than hand it out again
+                    await self._discard(db)
+                except BaseException:
+                    # Cancelled mid-rollback
+                    await self._discard(db)
+                    raise
+                else:
+                    self._idle.put_nowait(db)
+
+    async def fetchall(self, query: str, params=()) -> List[dict]:
+        """Run a query on a pooled connection and return its rows as dicts."""
+        async with self.acquire() as db:
+            async with db.execute(query, params) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+
+    async def fetchone(self, query: str, params=()) -> Optional[dict]:
+        """Run a query on a pooled connection and return the first row as a dict."""
+        async with self.acquire() as db:
+            async with db.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row is not None else None
+
+    async def execute(self, query: str, params=()) -> int:
+        """Run a write and commit it; returns the affected row count."""
+        async with self.acquire() as db:
+            cursor = await db.execute(query, params)
+            await db.commit()
+            return cursor.rowcount
+
+    async def close(self) -> None:
+        """Close every connection (call once no coroutine is using the pool)."""
+        self._closed = True
+        for db in self._all:
+            await db.close()
+        self._all.clear()
+        self._created = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+
+class QueryResult(NamedTuple):
+    """Outcome of one job run by run_queries()."""
+    index: int                          # position of the job in the input list
+    query: str
+    params: Sequence
+    rows: Optional[List[dict]]          # None when the query failed or timed out
+    error: Optional[BaseException]
+    seconds: float                      # execution time, excluding the wait for a slot
+
+
+async def _fetch_rows(db: aiosqlite.Connection, query: str, params: Sequence) -> List[dict]:
+    async with db.execute(query, params) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def _run_job(pool: AsyncConnectionPool, index: int, query: str, params: Sequence,
+                   slots: asyncio.Semaphore, timeout: Optional[float]) -> QueryResult:
+    async with slots:
+        async with pool.acquire() as db:
+            start = time.perf_counter()
+            try:
+                rows = await asyncio.wait_for(_fetch_rows(db, query, params), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+                # Abort the statement still running on the connection's thread
+                await db.interrupt()
+                if isinstance(exc, asyncio.CancelledError):
+                    raise
+                error = exc
+            except Exception as exc:
+                error = exc
+            else:
+                return QueryResult(index, query, params, rows, None,
+                                   time.perf_counter() - start)
+            return QueryResult(index, query, params, None, error,
+                               time.perf_counter() - start)
+
+
+async def run_queries(pool: AsyncConnectionPool, jobs: Iterable[Tuple[str, Sequence]],
+                      concurrency: int = 4,
+                      timeout: Optional[float] = None) -> AsyncIterator[QueryResult]:
+    """
+    Run (query, params) jobs on `pool` with at most `concurrency` in flight and
+    yield a QueryResult for each as soon as it completes (as_completed order).
+
+    A job slower than `timeout` seconds is interrupted and yields a result whose
+    error is a TimeoutError; other failures are reported the same way, so one bad
+    query does not abort the fan-out. Closing the generator early (break, then
+    aclose()) cancels the jobs that have not finished.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.ensure_future(_run_job(pool, i, query, tuple(params), slots, timeout))
+             for i, (query, params) in enumerate(jobs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def gather_queries(pool: AsyncConnectionPool, jobs: Iterable[Tuple[str, Sequence]],
+                         concurrency: int = 4,
+                         timeout: Optional[float] = None) -> List[QueryResult]:
+    """run_queries() collected into a list in job order."""
+    results = [result async for result in run_queries(pool, jobs, concurrency, timeout)]
+    return sorted(results, key=lambda r: r.index)
+
+
+# Shapes fetch_batch() can answer from a shared scan:
+#   SELECT * FROM <table> [WHERE <col> <op> <literal|?> [AND ...]]
+_SELECT_RE = re.compile(r"^\s*SELECT\s+\*\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?\s*;?\s*$",
+                        re.IGNORECASE | re.DOTALL)
+_TERM_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|<>|!=|=|<|>)\s*"
+                      r"(\?|-?\d+(?:\.\d+)?|'(?:[^']|'')*')\s*$")
+_AND_RE = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_OPERATORS = {"=": operator.eq, "!=": operator.ne, "<>": operator.ne,
+              "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _parse_select(query: str, params: Sequence):
+    """(table, [(column, op, value)]) for a simple filtered SELECT *, else None."""
+    match = _SELECT_RE.match(query)
+    if not match:
+        return None
+    table, where = match.group(1).lower(), match.group(2)
+    predicates, params = [], list(params)
+    for term in (_AND_RE.split(where) if where else ()):
+        term_match = _TERM_RE.match(term)
+        if not term_match:
+            return None
+        column, op, literal = term_match.groups()
+        if literal == "?":
+            if not params:
+                return None
+            value = params.pop(0)
+        elif literal.startswith("'"):
+            value = literal[1:-1].replace("''", "'")
+        else:
+            value = float(literal) if "." in literal else int(literal)
+        predicates.append((column.lower(), _OPERATORS[op], value))
+    if params:
+        return None
+    return table, predicates
+
+
+def _compares_like_python(table_sql: Optional[str], predicates) -> bool:
+    """
+    True if `table_sql` (the table's CREATE statement) declares no collation other
+    than BINARY on the predicate columns, so Python's str ordering matches SQLite's.
+    """
+    if table_sql is None:
+        return False   # a view, or no such table
+    for column, _, _ in predicates:
+        match = re.search(rf"\b{re.escape(column)}\b[^,]*\bCOLLATE\s+[\"'`\[]?(\w+)",
+                          table_sql, re.IGNORECASE)
+        if match and match.group(1).upper() != "BINARY":
+            return False
+    return True
+
+
+def _filter_rows(rows: List[dict], predicates) -> List[dict]:
+    """Rows matching every predicate; raises KeyError/TypeError when SQL semantics may differ."""
+    if not rows or not predicates:
+        return list(rows)
+    columns = {key.lower(): key for key in rows[0]}
+    checks = [(columns[column], compare, value) for column, compare, value in predicates]
+    out = []
+    for row in rows:
+        for key, compare, value in checks:
+            cell = row[key]
+            # NULL never satisfies a comparison; mixed text/number ordering is SQLite's, not Python's
+            if cell is None or value is None:
+                break
+            if isinstance(cell, str) != isinstance(value, str):
+                raise TypeError(f"cannot compare {cell!r} with {value!r} in memory")
+            if not compare(cell, value):
+                break
+        else:
+            out.append(row)
+    return out
+
+
+async def fetch_batch(pool: AsyncConnectionPool,
+                      queries: Sequence[Tuple[str, Sequence]]) -> List[List[dict]]:
+    """
+    Run a batch of (query, params) SELECTs, returning each one's rows in order.
+
+    When the batch contains an unfiltered `SELECT * FROM t`, every other simple
+    `SELECT * FROM t WHERE col op value [AND ...]` in it is a subset of that scan:
+    the table is read once and those predicates are evaluated in memory over the
+    shared rows. Anything else runs as its own query, as does a predicate that
+    cannot be evaluated exactly in Python (NULLs aside: text compared with numbers,
+    columns declared with a NOCASE/RTRIM collation, columns not in the result).
+    The independent reads run concurrently.
+    """
+    parsed = [_parse_select(query, params) for query, params in queries]
+    scans: Dict[str, int] = {}   # table -> index of the unfiltered query that scans it
+    for i, shape in enumerate(parsed):
+        if shape is not None and not shape[1]:
+            scans.setdefault(shape[0], i)
+    candidates = {i: shape for i, shape in enumerate(parsed)
+                  if shape is not None and shape[0] in scans and scans[shape[0]] != i}
+    tables = sorted({shape[0] for shape in candidates.values()})
+    schemas = await asyncio.gather(*(pool.fetchone(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+        (table,)) for table in tables))
+    table_sql = {table: row and row["sql"] for table, row in zip(tables, schemas)}
+    derived = {i: scans[shape[0]] for i, shape in candidates.items()
+               if _compares_like_python(table_sql[shape[0]], shape[1])}
+    direct = [i for i in range(len(queries)) if i not in derived]
+
+    results: List[Optional[List[dict]]] = [None] * len(queries)
+    fetched = await asyncio.gather(*(pool.fetchall(*queries[i]) for i in direct))
+    for i, rows in zip(direct, fetched):
+        results[i] = rows
+    fallback = []
+    for i, source in derived.items():
+        try:
+            results[i] = _filter_rows(results[source], parsed[i][1])
+        except (KeyError, TypeError):
+            fallback.append(i)
+    if fallback:
+        fetched = await asyncio.gather(*(pool.fetchall(*queries[i]) for i in fallback))
+        for i, rows in zip(fallback, fetched):
+            results[i] = rows
+    return results
+
+
+async def asyncfetchusers(db_path: str, pool: Optional[AsyncConnectionPool] = None):
+    """Fetch all users asynchronously (on `pool` when given)."""
+    if pool is not None:
+        return await pool.fetchall("SELECT * FROM users")
     async with aiosqlite.connect(db_path) as db:
         db.row_factory = aiosqlite.Row
         async with db.execute("SELECT * FROM users") as cursor:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
-async def asyncfetcholder_users(db_path: str):
-    """Fetch users older than 40 asynchronously."""
+async def asyncfetcholder_users(db_path: str, pool: Optional[AsyncConnectionPool] = None):
+    """Fetch users older than 40 asynchronously (on `pool` when given)."""
+    if pool is not None:
+        return await pool.fetchall("SELECT * FROM users WHERE age > 40")
     async with aiosqlite.connect(db_path) as db:
         db.row_factory = aiosqlite.Row
         async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
@@ -25,11 +349,12 @@ async def asyncfetcholder_users(db_path: str):
 
 
 async def fetch_concurrently(db_path: str):
-    """Run both queries concurrently and print results."""
-    all_users, older_users = await asyncio.gather(
-        asyncfetchusers(db_path),
-        asyncfetcholder_users(db_path)
-    )
+    """Fetch all users and users older than 40 with one table scan and print results."""
+    async with AsyncConnectionPool(db_path, max_size=2) as pool:
+        all_users, older_users = await fetch_batch(pool, [
+            ("SELECT * FROM users", ()),
+            ("SELECT * FROM users WHERE age > 40", ()),
+        ])
 
     print("All users:")
     for user in all_users:
@@ -40,6 +365,21 @@ async def fetch_concurrently(db_path: str):
         print(user)
 
 
+async def fetch_age_buckets(db_path: str, concurrency: int = 4, timeout: float = 5.0):
+    """
+    Example of run_queries(): one query per age bucket, printed as each finishes
+    with its latency. Not run by this script:
+    asyncio.run(fetch_age_buckets("users.db")).
+    """
+    jobs = [("SELECT COUNT(*) AS users FROM users WHERE age >= ? AND age < ?", (lo, lo + 10))
+            for lo in range(0, 100, 10)]
+    async with AsyncConnectionPool(db_path, max_size=concurrency) as pool:
+        async for result in run_queries(pool, jobs, concurrency, timeout):
+            lo = result.params[0]
+            outcome = result.rows[0]["users"] if result.error is None else repr(result.error)
+            print(f"age {lo}-{lo + 9}: {outcome} ({result.seconds * 1000:.2f} ms)")
+
+
 if __name__ == "__main__":
     db_path = os.getenv("DB_PATH", "users.db")
     asyncio.run(fetch_concurrently(db_path))
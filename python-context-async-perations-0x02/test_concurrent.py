@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async pool, executor and batching in 3-concurrent.py.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+try:
+    concurrent = __import__('3-concurrent')
+except ImportError:   # aiosqlite is not installed
+    concurrent = None
+
+
+@unittest.skipIf(concurrent is None, "aiosqlite is not installed")
+class ConcurrentTestCase(unittest.IsolatedAsyncioTestCase):
+    """Base: a scratch users.db and a pool on it."""
+
+    USERS = [(1, "Amina", 22), (2, "Brian", 41), (3, "Chen", 35), (4, "Dayo", 55),
+             (5, "Elsa", None), (6, "fatma", 43)]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO users VALUES (?, ?, ?)", self.USERS)
+
+    async def asyncSetUp(self):
+        self.pool = concurrent.AsyncConnectionPool(self.db_path, max_size=2)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class TestAsyncConnectionPool(ConcurrentTestCase):
+    """Tests for AsyncConnectionPool"""
+
+    async def test_many_coroutines_share_max_size_connections(self):
+        """Concurrent queries never open more than max_size connections"""
+        threads = threading.active_count()
+        rows = await asyncio.gather(*(self.pool.fetchone(
+            "SELECT COUNT(*) AS n FROM users WHERE age > ?", (i,)) for i in range(50)))
+        self.assertEqual(rows[0], {"n": 5})
+        self.assertEqual(self.pool._created, 2)
+        self.assertLessEqual(threading.active_count() - threads, 2)
+
+    async def test_acquire_rolls_back_uncommitted_work(self):
+        """Work left uncommitted in an acquire() block is rolled back"""
+        async with self.pool.acquire() as db:
+            await db.execute("DELETE FROM users")
+        self.assertEqual(await self.pool.fetchone("SELECT COUNT(*) AS n FROM users"), {"n": 6})
+
+    async def test_execute_commits(self):
+        """execute() commits and returns the affected row count"""
+        self.assertEqual(await self.pool.execute("DELETE FROM users WHERE age > ?", (40,)), 3)
+        self.assertEqual(await self.pool.fetchone("SELECT COUNT(*) AS n FROM users"), {"n": 3})
+
+    async def failing_rollback(self, db, error):
+        """Start a transaction on db and make its rollback raise `error`."""
+        await db.execute("DELETE FROM users")
+
+        async def rollback():
+            raise error
+        db.rollback = rollback
+
+    async def test_failed_rollback_frees_the_slot(self):
+        """A connection whose rollback raises is closed and replaced, even for waiters"""
+        pool = concurrent.AsyncConnectionPool(self.db_path, max_size=1)
+        try:
+            async with pool.acquire() as broken:
+                waiter = asyncio.ensure_future(pool.fetchone("SELECT COUNT(*) AS n FROM users"))
+                await asyncio.sleep(0.01)
+                await self.failing_rollback(broken, sqlite3.OperationalError("disk I/O error"))
+            self.assertEqual(await asyncio.wait_for(waiter, 5), {"n": 6})
+            self.assertEqual(pool._created, 1)
+            self.assertNotIn(broken, pool._all)
+        finally:
+            await pool.close()
+
+    async def test_cancelled_rollback_frees_the_slot(self):
+        """A rollback interrupted by cancellation does not lose the pool slot"""
+        pool = concurrent.AsyncConnectionPool(self.db_path, max_size=1)
+        try:
+            with self.assertRaises(asyncio.CancelledError):
+                async with pool.acquire() as db:
+                    await self.failing_rollback(db, asyncio.CancelledError())
+            self.assertEqual(
+                await asyncio.wait_for(pool.fetchone("SELECT COUNT(*) AS n FROM users"), 5),
+                {"n": 6})
+        finally:
+            await pool.close()
+
+    async def test_release_after_close_closes_the_connection(self):
+        """A connection returned after close() is closed, not queued again"""
+        async with self.pool.acquire() as db:
+            await self.pool.close()
+        self.assertTrue(self.pool._idle.empty())
+        with self.assertRaises(ValueError):
+            await db.execute("SELECT 1")
+
+    async def test_closed_pool_refuses_queries(self):
+        """acquire() raises once the pool is closed"""
+        await self.pool.close()
+        with self.assertRaises(RuntimeError):
+            await self.pool.fetchall("SELECT * FROM users")
+
+
+# A statement that runs for seconds unless interrupted
+SLOW = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+        "SELECT COUNT(*) AS n FROM c")
+
+
+class TestRunQueries(ConcurrentTestCase):
+    """Tests for run_queries and gather_queries"""
+
+    async def test_results_carry_rows_errors_and_latency(self):
+        """Each job yields its rows or its error, tagged with its input index"""
+        jobs = [("SELECT name FROM users WHERE id = ?", (i,)) for i in (1, 2)]
+        jobs.append(("SELECT missing FROM users", ()))
+        results = await concurrent.gather_queries(self.pool, jobs)
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        self.assertEqual(results[1].rows, [{"name": "Brian"}])
+        self.assertIsNone(results[2].rows)
+        self.assertIsInstance(results[2].error, sqlite3.OperationalError)
+        self.assertTrue(all(r.seconds >= 0 for r in results))
+
+    async def test_streams_in_completion_order(self):
+        """A fast job is yielded before a slow one submitted earlier"""
+        jobs = [(SLOW, ()), ("SELECT 1 AS one", ())]
+        order = [r.index async for r in concurrent.run_queries(self.pool, jobs, timeout=0.3)]
+        self.assertEqual(order, [1, 0])
+
+    async def test_timeout_interrupts_the_query(self):
+        """A job over its timeout is reported as TimeoutError and stops running"""
+        started = asyncio.get_running_loop().time()
+        (result,) = await concurrent.gather_queries(self.pool, [(SLOW, ())], timeout=0.1)
+        self.assertIsInstance(result.error, asyncio.TimeoutError)
+        # The interrupted connection is usable again right away
+        self.assertEqual(await self.pool.fetchone("SELECT 2 AS two"), {"two": 2})
+        self.assertLess(asyncio.get_running_loop().time() - started, 2.0)
+
+    async def test_concurrency_limit(self):
+        """At most `concurrency` jobs hold a connection at once"""
+        pool = concurrent.AsyncConnectionPool(self.db_path, max_size=4)
+        try:
+            await concurrent.gather_queries(pool, [("SELECT 1", ())] * 20, concurrency=1)
+            self.assertEqual(pool._created, 1)
+        finally:
+            await pool.close()
+
+    async def test_closing_early_cancels_pending_jobs(self):
+        """aclose() after the first result cancels and interrupts the rest"""
+        pool = concurrent.AsyncConnectionPool(self.db_path, max_size=3)
+        try:
+            results = concurrent.run_queries(pool, [(SLOW, ()), (SLOW, ()), ("SELECT 1", ())],
+                                             concurrency=3)
+            first = await asyncio.wait_for(results.__anext__(), 2.0)
+            self.assertEqual(first.index, 2)
+            await asyncio.wait_for(results.aclose(), 2.0)
+            self.assertEqual(await asyncio.wait_for(pool.fetchone("SELECT 3 AS three"), 2.0),
+                             {"three": 3})
+        finally:
+            await pool.close()
+
+
+class TestFetchBatch(ConcurrentTestCase):
+    """Tests for fetch_batch's shared scans"""
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.executed = []
+        fetchall = self.pool.fetchall
+
+        async def recording_fetchall(query, params=()):
+            self.executed.append(query)
+            return await fetchall(query, params)
+        self.pool.fetchall = recording_fetchall
+
+    async def assertMatchesDirect(self, queries, reads):
+        """fetch_batch returns what each query returns on its own, using `reads` queries."""
+        results = await concurrent.fetch_batch(self.pool, queries)
+        self.assertEqual(len(self.executed), reads, self.executed)
+        for (query, params), rows in zip(queries, results):
+            self.assertEqual(rows, await self.pool.fetchall(query, params), query)
+        return results
+
+    async def test_subset_query_shares_the_scan(self):
+        """A filtered query is answered from the unfiltered scan"""
+        all_users, older = await self.assertMatchesDirect(
+            [("SELECT * FROM users", ()), ("SELECT * FROM users WHERE age > 40", ())], 1)
+        self.assertEqual([u["name"] for u in older], ["Brian", "Dayo", "fatma"])
+
+    async def test_null_cells_never_match(self):
+        """Rows whose column is NULL satisfy no comparison, as in SQL"""
+        queries = [("SELECT * FROM users", ())]
+        queries += [(f"SELECT * FROM users WHERE age {op} 41", ())
+                    for op in ("=", "!=", "<>", "<", "<=", ">", ">=")]
+        results = await self.assertMatchesDirect(queries, 1)
+        for rows in results[1:]:
+            self.assertNotIn("Elsa", [u["name"] for u in rows])
+
+    async def test_question_mark_binding(self):
+        """? placeholders take the query's parameters in order"""
+        await self.assertMatchesDirect(
+            [("SELECT * FROM users", ()),
+             ("SELECT * FROM users WHERE age >= ? AND name != ?", (35, "Chen")),
+             ("select * from USERS where Age < ? and id > 1", (50,)),
+             ("SELECT * FROM users WHERE name = 'O''Brien' AND age > -1.5", ())], 1)
+
+    async def test_mixed_type_comparison_falls_back(self):
+        """Text compared with a number is left to SQLite"""
+        await self.assertMatchesDirect(
+            [("SELECT * FROM users", ()),
+             ("SELECT * FROM users WHERE name > 5", ()),
+             ("SELECT * FROM users WHERE age = ?", ("41",))], 3)
+
+    async def test_other_shapes_run_directly(self):
+        """Anything but SELECT * with ANDed simple comparisons is not derived"""
+        shapes = [
+            ("SELECT name FROM users WHERE age > 40", ()),
+            ("SELECT * FROM users WHERE age > 40 OR age < 25", ()),
+            ("SELECT * FROM users WHERE age > 40 ORDER BY age", ()),
+            ("SELECT * FROM users WHERE age IN (22, 41)", ()),
+            ("SELECT * FROM users WHERE age > 40 LIMIT 1", ()),
+            ("SELECT * FROM users WHERE age + 1 > 40", ()),
+            ("SELECT * FROM users WHERE rowid > 2", ()),
+        ]
+        for query, params in shapes:
+            if "rowid" not in query:
+                self.assertIsNone(concurrent._parse_select(query, params), query)
+        self.assertIsNone(concurrent._parse_select("SELECT * FROM users WHERE age > ?", ()))
+        await self.assertMatchesDirect([("SELECT * FROM users", ())] + shapes, 1 + len(shapes))
+
+    async def test_results_follow_input_order(self):
+        """Results line up with the input, wherever the scan sits in the batch"""
+        results = await self.assertMatchesDirect(
+            [("SELECT * FROM users WHERE age > 40", ()),
+             ("SELECT COUNT(*) AS n FROM users", ()),
+             ("SELECT * FROM users", ()),
+             ("SELECT * FROM users WHERE age < 30", ())], 2)
+        self.assertEqual(results[1], [{"n": 6}])
+        self.assertEqual([u["name"] for u in results[3]], ["Amina"])
+
+    async def test_nocase_column_falls_back(self):
+        """Columns with a non-BINARY collation are compared by SQLite"""
+        await self.pool.execute(
+            "CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE)")
+        await self.pool.execute("INSERT INTO people (name) VALUES ('fatma'), ('Brian')")
+        self.executed.clear()
+        results = await self.assertMatchesDirect(
+            [("SELECT * FROM people", ()),
+             ("SELECT * FROM people WHERE name = 'FATMA'", ()),
+             ("SELECT * FROM people WHERE id > 1", ())], 2)
+        self.assertEqual(len(results[1]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
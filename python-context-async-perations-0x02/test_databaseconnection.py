@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pooled DatabaseConnection (0-databaseconnection.py).
+"""
+
+import os
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+databaseconnection = __import__('0-databaseconnection')
+ConnectionPool = databaseconnection.ConnectionPool
+PooledDatabaseConnection = databaseconnection.PooledDatabaseConnection
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for ConnectionPool and PooledDatabaseConnection."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+            conn.execute("INSERT INTO users (name, age) VALUES ('Amina', 22)")
+        self.pool = ConnectionPool(self.db_path, max_size=2, timeout=0.2, leak_timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def count(self):
+        with PooledDatabaseConnection(self.db_path, pool=self.pool) as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def test_reuses_warm_connection(self):
+        """Sequential blocks share one connection with rows as sqlite3.Row"""
+        with PooledDatabaseConnection(self.db_path, pool=self.pool) as first:
+            row = first.execute("SELECT name FROM users").fetchone()
+        with PooledDatabaseConnection(self.db_path, pool=self.pool) as second:
+            mode = second.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertIs(first, second)
+        self.assertEqual(row["name"], "Amina")
+        self.assertEqual(mode, "wal")
+        self.assertEqual(self.pool.stats()["size"], 1)
+
+    def test_commits_on_success_and_rolls_back_on_error(self):
+        """The block's writes are committed, or rolled back if it raises"""
+        with PooledDatabaseConnection(self.db_path, pool=self.pool) as conn:
+            conn.execute("INSERT INTO users (name, age) VALUES ('Brian', 41)")
+        with self.assertRaises(ValueError):
+            with PooledDatabaseConnection(self.db_path, pool=self.pool) as conn:
+                conn.execute("INSERT INTO users (name, age) VALUES ('Chen', 35)")
+                raise ValueError("boom")
+        self.assertEqual(self.count(), 2)
+
+    def test_blocks_then_times_out_when_exhausted(self):
+        """acquire() waits for a release, then raises TimeoutError"""
+        first = self.pool.acquire()
+        self.pool.acquire()
+        threading.Timer(0.05, self.pool.release, [first]).start()
+        self.assertIs(self.pool.acquire(), first)
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+        stats = self.pool.stats()
+        self.assertEqual((stats["waits"], stats["timeouts"], stats["in_use"]), (2, 1, 2))
+
+    def test_reports_each_leak_once(self):
+        """A connection held past leak_timeout is reported once"""
+        self.pool.acquire()
+        time.sleep(0.1)
+        with self.assertLogs(databaseconnection.logger, "WARNING") as logs:
+            (leak,) = self.pool.check_leaks()
+        self.assertEqual(leak[1][-1][2], "test_reports_each_leak_once")
+        self.assertIn("self.pool.acquire()", logs.output[0])
+        self.assertEqual(self.pool.check_leaks(), [])
+        self.assertEqual(self.pool.stats()["leaks"], 1)
+
+    def test_leaks_are_logged_outside_the_lock(self):
+        """A waiting acquire() reports leaks without holding the pool lock"""
+        self.pool.acquire()
+        self.pool.acquire()
+        time.sleep(0.1)
+        free = []
+
+        class Probe(logging.Handler):
+            def emit(handler, record):
+                thread = threading.Thread(target=lambda: free.append(self.pool.stats()["in_use"]))
+                thread.start()
+                thread.join(0.5)
+
+        probe = Probe()
+        databaseconnection.logger.addHandler(probe)
+        try:
+            with self.assertRaises(TimeoutError):
+                self.pool.acquire(timeout=0.01)
+        finally:
+            databaseconnection.logger.removeHandler(probe)
+        self.assertEqual(free, [2, 2])
+
+    def test_close_closes_connections_released_later(self):
+        """After close(), released connections are closed and acquire() raises"""
+        conn = self.pool.acquire()
+        self.pool.close()
+        self.pool.release(conn)
+        self.assertEqual(self.pool.stats()["size"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,28 +1,119 @@
+import time
+import queue
+import atexit
 import sqlite3
+import logging
+import itertools
 import functools
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime   # ✅ required by checker
 
 # Configure basic logging (INFO level). Adjust as needed.
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that enqueues the record as-is; the listener thread does the formatting."""
+
+    def prepare(self, record):
+        return record
+
+
+# Listeners started by enable_async_logging, one per logger
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def enable_async_logging(target=None):
+    """
+    Move the handlers of `target` (default: this module's logger, else the root handlers)
+    behind a queue: callers only enqueue the record, a background QueueListener formats
+    and writes it. Returns the started listener; it is stopped (queue flushed) at exit.
+    Calling it again for the same logger returns the running listener.
+    """
+    target = target or logger
+    with _listeners_lock:
+        listener = _listeners.get(target)
+        if listener is None:
+            handlers = target.handlers or logging.getLogger().handlers
+            records = queue.SimpleQueue()
+            listener = QueueListener(records, *handlers, respect_handler_level=True)
+            target.handlers = [_DeferredQueueHandler(records)]
+            target.propagate = False
+            listener.start()
+            _listeners[target] = listener
+    return listener
+
+
+@atexit.register
+def _stop_listeners():
+    with _listeners_lock:
+        listeners = list(_listeners.values())
+        _listeners.clear()
+    for listener in listeners:
+        listener.stop()
+
+
+class _RateLimiter:
+    """Token bucket allowing `per_second` events per second (bursts up to one second's worth)."""
+
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_second,
+                               self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+def _find_query(args, kwargs):
+    # Try to read a 'query' kwarg, else the second positional (after self/first arg if any)
+    query = kwargs.get("query")
+    if query is None and len(args) >= 1:
+        # In our example, fetch_all_users(query=...) passes query as first and only arg
+        # But be defensive: scan positional args for a string that looks like SQL.
+        for a in args:
+            if isinstance(a, str):
+                query = a
+                break
+    return query
+
+
 # Decorator to log SQL queries
-def log_queries(func):
+def log_queries(func=None, *, sample_every=1, max_per_second=None):
+    """
+    Log the SQL each call executes.
+    Hot paths can log a sample: `sample_every=N` logs 1 call in N, `max_per_second`
+    caps the log rate. Skipped calls cost a counter bump, no argument scanning or
+    formatting; logged ones format lazily (and off-thread after enable_async_logging()).
+    """
+    if func is None:
+        return functools.partial(log_queries, sample_every=sample_every,
+                                 max_per_second=max_per_second)
+    counter = itertools.count()
+    limiter = _RateLimiter(max_per_second) if max_per_second else None
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Try to read a 'query' kwarg, else the second positional (after self/first arg if any)
-        query = kwargs.get("query")
-        if query is None and len(args) >= 1:
-            # In our example, fetch_all_users(query=...) passes query as first and only arg
-            # But be defensive: scan positional args for a string that looks like SQL.
-            for a in args:
-                if isinstance(a, str):
-                    query = a
-                    break
-        if query is not None:
-            logger.info("Executing SQL: %s", query)
-        else:
-            logger.info("Executing SQL function: %s (query not explicitly provided)", func.__name__)
+        if (logger.isEnabledFor(logging.INFO)
+                and (sample_every <= 1 or next(counter) % sample_every == 0)
+                and (limiter is None or limiter.allow())):
+            query = _find_query(args, kwargs)
+            if query is not None:
+                logger.info("Executing SQL: %s", query)
+            else:
+                logger.info("Executing SQL function: %s (query not explicitly provided)", func.__name__)
         return func(*args, **kwargs)
     return wrapper
 
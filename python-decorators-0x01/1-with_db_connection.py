@@ -1,8 +1,20 @@
 import sqlite3
+import inspect
 import functools
 
 def with_db_connection(func):
-    """Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward."""
+    """
+    Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward.
+    `async def` functions get an aiosqlite connection instead.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
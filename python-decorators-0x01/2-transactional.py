@@ -1,8 +1,42 @@
+import re
+import time
+import queue
 import sqlite3
+import inspect
 import functools
+import weakref
+import threading
+from concurrent.futures import Future
+
+# Listeners called as listener(db_path, tables) after each commit made by `transactional`
+commit_listeners = []
+
+# Table written by INSERT/REPLACE/UPDATE/DELETE, or changed by DDL
+_WRITE_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?"
+    r"|DELETE\s+FROM|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+# Statements that end the current transaction (not ROLLBACK TO a savepoint)
+_END_RE = re.compile(r"^\s*(COMMIT|END|ROLLBACK)\b(?!.*\bTO\b)", re.IGNORECASE | re.DOTALL)
+
+# Sync wrappers made by `transactional`, unwrapped by GroupCommitWriter.submit
+_transactional_wrappers = weakref.WeakSet()
 
 def with_db_connection(func):
-    """Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward."""
+    """
+    Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward.
+    `async def` functions get an aiosqlite connection instead.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
@@ -13,20 +47,245 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
+def register_commit_listener(listener):
+    """Call listener(db_path, tables) after every commit that wrote to `tables`."""
+    commit_listeners.append(listener)
+
+
+def db_path_of(conn):
+    """Absolute file path of the connection's main database ('' for in-memory)."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path
+    return ""
+
+
+async def adb_path_of(conn):
+    """db_path_of for an aiosqlite connection."""
+    async with conn.execute("PRAGMA database_list") as cursor:
+        for _, name, path in await cursor.fetchall():
+            if name == "main":
+                return path
+    return ""
+
+
+def _write_tracer(written):
+    """sqlite trace callback adding the tables written by each statement to `written`."""
+    def trace(sql):
+        match = _WRITE_RE.match(sql)
+        if match:
+            written.add(match.group(1).lower())
+    return trace
+
+
+def _notify(path, written):
+    for listener in commit_listeners:
+        listener(path, frozenset(written))
+
+
 def transactional(func):
-    """Wrap DB operations in a transaction: commit on success, rollback on error, re-raise."""
+    """
+    Wrap DB operations in a transaction: commit on success, rollback on error, re-raise.
+    Tables written inside the transaction are reported to commit_listeners after commit
+    (e.g. so cached reads of those tables can be invalidated).
+    Works on `async def` functions taking an aiosqlite connection too.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            written = set()
+            await conn.set_trace_callback(_write_tracer(written))
+            try:
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            finally:
+                await conn.set_trace_callback(None)
+            if written and commit_listeners:
+                _notify(await adb_path_of(conn), written)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set()
+        conn.set_trace_callback(_write_tracer(written))
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception:
             conn.rollback()
             raise
+        finally:
+            conn.set_trace_callback(None)
+        if written and commit_listeners:
+            _notify(db_path_of(conn), written)
+        return result
+    _transactional_wrappers.add(wrapper)
     return wrapper
 
 
+class GroupCommitWriter:
+    """
+    Group commit: many callers submit write operations and a single writer thread runs
+    them in one transaction per `max_batch` operations or `max_delay` seconds, so N writes
+    cost one commit (one fsync) instead of N.
+
+    submit(func, *args, **kwargs) calls func(conn, *args, **kwargs) on the writer thread
+    and returns a Future. Each operation runs under its own SAVEPOINT: a failing operation
+    is rolled back alone and its Future gets the exception; the others still commit.
+    Futures resolve only after the batch's COMMIT succeeds.
+
+    Operations must not commit or roll back themselves; `transactional` functions are
+    submitted without that wrapper. An operation that still ends the transaction splits
+    the batch: if it committed, everything before it is settled as committed; if it rolled
+    back, the earlier operations of the batch fail with the RuntimeError that says so.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path='users.db', max_batch=100, max_delay=0.005):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = {"operations": 0, "failed": 0, "commits": 0}
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(conn, *args, **kwargs); returns a Future of its return value."""
+        if self._closed:
+            raise RuntimeError("GroupCommitWriter is closed")
+        # The writer owns the transaction: run `transactional` functions unwrapped
+        while func in _transactional_wrappers:
+            func = func.__wrapped__
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self):
+        """Commit everything already submitted, then stop the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _run(self):
+        # Autocommit mode: transaction boundaries are issued explicitly below
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        written = set()
+        ended = []   # transaction-ending statements run by the current operation
+        trace_write = _write_tracer(written)
+
+        def trace(sql):
+            trace_write(sql)
+            match = _END_RE.match(sql)
+            if match:
+                ended.append(match.group(1).upper())
+
+        outcomes = []   # (future, result) of operations in the open transaction
+        conn.set_trace_callback(trace)
+        try:
+            conn.execute("BEGIN")
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT op")
+                ended.clear()
+                try:
+                    result, error = func(conn, *args, **kwargs), None
+                except Exception as exc:
+                    result, error = None, exc
+                if not conn.in_transaction:
+                    # The operation ended the group transaction itself
+                    if ended and ended[-1] != "ROLLBACK":
+                        if error is None:
+                            outcomes.append((future, result))
+                        else:
+                            self._fail(future, error)
+                        self._settle(conn, outcomes, written)
+                    else:
+                        lost = RuntimeError("rolled back by another operation of the group commit")
+                        for earlier, _ in outcomes:
+                            self._fail(earlier, lost)
+                        self._fail(future, error or RuntimeError(
+                            "operation rolled back the group commit transaction"))
+                    outcomes = []
+                    written.clear()
+                    conn.execute("BEGIN")
+                    continue
+                if error is not None:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    self._fail(future, error)
+                    continue
+                conn.execute("RELEASE op")
+                outcomes.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            # BEGIN/COMMIT itself failed: nothing still pending in this batch was written
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _ in outcomes:
+                future.set_exception(exc)
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            conn.set_trace_callback(None)
+        self._settle(conn, outcomes, written)
+
+    def _fail(self, future, error):
+        future.set_exception(error)
+        self.stats["failed"] += 1
+
+    def _settle(self, conn, outcomes, written):
+        """Resolve the futures of a committed transaction and notify commit listeners."""
+        self.stats["commits"] += 1
+        self.stats["operations"] += len(outcomes)
+        for future, result in outcomes:
+            future.set_result(result)
+        if written and commit_listeners:
+            _notify(db_path_of(conn), written)
+
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
@@ -39,3 +298,13 @@ if __name__ == "__main__":
     # Update user's email with automatic transaction handling
     update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
     print("Email updated.")
+
+    # Many updates, committed in groups instead of one transaction each
+    # (the same user and email again, so the demo changes nothing else)
+    with GroupCommitWriter() as writer:
+        futures = [writer.submit(update_user_email.__wrapped__, user_id=1,
+                                 new_email='Crawford_Cartwright@hotmail.com')
+                   for _ in range(100)]
+        for f in futures:
+            f.result()
+    print(f"{writer.stats['operations']} updates in {writer.stats['commits']} commits.")
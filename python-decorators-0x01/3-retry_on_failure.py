@@ -1,9 +1,24 @@
 import time
+import random
+import asyncio
 import sqlite3
+import inspect
 import functools
+import threading
 
 def with_db_connection(func):
-    """Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward."""
+    """
+    Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward.
+    `async def` functions get an aiosqlite connection instead.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
@@ -14,21 +29,145 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
-    """Retry a function up to `retries` times with `delay` seconds between attempts on any Exception."""
+def transient_sqlite_error(exc):
+    """Retry predicate: only SQLite lock/busy contention, not e.g. syntax errors."""
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of calls (opt in per decorator
+    with budget=retry_budget, or share any other instance).
+    Every call deposits `ratio` tokens, every retry withdraws one, and
+    `min_per_second` retries are always allowed so low traffic can still retry.
+    During an outage the bucket drains and callers fail fast instead of
+    multiplying the load on the database.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=10.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "rejected": 0}
+
+    def _refill(self, amount):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens,
+                           self._tokens + amount + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            self._refill(self.ratio)
+
+    def try_retry(self):
+        """Withdraw a token for one retry; False when the budget is exhausted."""
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["retries"] += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+
+retry_budget = RetryBudget()
+
+BACKOFF_STRATEGIES = ("fixed", "exponential", "decorrelated")
+
+
+def _backoff_delays(strategy, delay, max_delay):
+    """Yield successive sleep times for 'fixed', 'exponential' or 'decorrelated' backoff."""
+    if strategy == "fixed":
+        while True:
+            yield delay
+    elif strategy == "exponential":
+        # Full jitter: uniform in [0, delay * 2**n], capped
+        n = 0
+        while True:
+            yield random.uniform(0, min(max_delay, delay * 2 ** n))
+            n += 1
+    else:
+        # Decorrelated jitter: next = uniform(base, previous * 3), capped
+        current = delay
+        while True:
+            current = min(max_delay, random.uniform(delay, current * 3))
+            yield current
+
+
+def retry_on_failure(retries=3, delay=2, backoff="fixed", max_delay=30.0,
+                     max_total=None, retry_if=None, budget=None):
+    """
+    Retry a function up to `retries` times on failure.
+
+    - backoff: 'fixed' (`delay` between attempts), 'exponential' (full jitter) or
+      'decorrelated' (decorrelated jitter); jittered sleeps never exceed `max_delay`.
+    - max_total: give up once the next sleep would pass this many seconds since the first attempt.
+    - retry_if: predicate on the exception (e.g. transient_sqlite_error); default retries any Exception.
+    - budget: RetryBudget shared with other callers (e.g. the process-wide `retry_budget`);
+      no retry is made while it is exhausted. Default None: every failure up to `retries` is retried.
+
+    `async def` functions wait with asyncio.sleep so the event loop is not blocked.
+    """
+    if backoff not in BACKOFF_STRATEGIES:
+        raise ValueError(f"Unknown backoff strategy: {backoff!r}")
+
+    def next_sleep(exc, attempt, delays, started):
+        """Seconds to wait before the next attempt, or None to re-raise."""
+        if attempt > retries or (retry_if is not None and not retry_if(exc)):
+            return None
+        pause = next(delays)
+        if max_total is not None and time.monotonic() - started + pause > max_total:
+            return None
+        if budget is not None and not budget.try_retry():
+            return None
+        return pause
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.record_call()
+                delays = _backoff_delays(backoff, delay, max_delay)
+                started = time.monotonic()
+                attempt = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        attempt += 1
+                        pause = next_sleep(e, attempt, delays, started)
+                        if pause is None:
+                            raise
+                        await asyncio.sleep(pause)
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            if budget is not None:
+                budget.record_call()
+            delays = _backoff_delays(backoff, delay, max_delay)
+            started = time.monotonic()
             attempt = 0
             while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
                     attempt += 1
-                    if attempt > retries:
-                        # Exceeded max retries: re-raise the last exception
+                    pause = next_sleep(e, attempt, delays, started)
+                    if pause is None:
+                        # Out of attempts, time or budget, or not retryable: re-raise
                         raise
-                    time.sleep(delay)
+                    time.sleep(pause)
         return wrapper
     return decorator
 
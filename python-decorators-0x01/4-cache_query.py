@@ -1,10 +1,324 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import pickle
+import asyncio
+import hashlib
 import sqlite3
+import inspect
 import functools
+import threading
+from collections import OrderedDict
 
-query_cache = {}
+_MISSING = object()
+
+# Tables a SELECT reads from
+_READ_RE = re.compile(r"\b(?:FROM|JOIN)\s+[\"`\[]?(\w+)", re.IGNORECASE)
+
+
+def _result_size(result):
+    """Approximate in-memory size in bytes of a fetchall() result."""
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for row in result:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+class DiskCacheTier:
+    """
+    Second cache tier persisted in a SQLite file, shared by every process on the host
+    (WAL mode, one connection per thread) and surviving restarts.
+
+    Results are pickled and zlib-compressed when large. Each entry is stamped with the
+    format version and the version of every table it reads; invalidate_tables() bumps
+    those table versions, so a write seen by any process makes older entries stale in this
+    tier. QueryCache stamps its memory entries the same way and rechecks them on every hit.
+    """
+
+    FORMAT_VERSION = 1
+    _COMPRESS_OVER = 512   # bytes
+
+    def __init__(self, path='query_cache.db', ttl=3600.0, max_entries=100_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "writes": 0, "stale_puts": 0}
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                         "key TEXT PRIMARY KEY, format INTEGER, stamp TEXT, "
+                         "expires REAL, payload BLOB)")
+            conn.execute("CREATE TABLE IF NOT EXISTS table_versions ("
+                         "db_path TEXT, tbl TEXT, version INTEGER, PRIMARY KEY (db_path, tbl))")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def _versions(self, conn, db_path, tables):
+        rows = conn.execute(
+            "SELECT tbl, version FROM table_versions WHERE db_path = ? AND tbl IN (%s)"
+            % ",".join("?" * len(tables)), (db_path, *tables)).fetchall() if tables else []
+        versions = dict.fromkeys(tables, 0)
+        versions.update(rows)
+        return versions
+
+    def versions(self, db_path, tables):
+        """Current version stamp {table: version} of tables."""
+        return self._versions(self._conn(), db_path, sorted(tables))
+
+    def is_current(self, db_path, stamp):
+        """True if no table in stamp was invalidated since stamp was taken."""
+        return self.versions(db_path, stamp) == stamp
+
+    def get(self, key):
+        """Return (result, stamp) for a fresh entry, or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT format, stamp, expires, payload FROM entries WHERE key = ?",
+                           (self._digest(key),)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        fmt, stamp, expires, payload = row
+        stamp = json.loads(stamp)
+        if (fmt != self.FORMAT_VERSION or expires < time.time()
+                or self._versions(conn, key[0], sorted(stamp)) != stamp):
+            self.stats["stale"] += 1
+            return None
+        if payload[:1] == b"z":
+            payload = zlib.decompress(payload[1:])
+        else:
+            payload = payload[1:]
+        self.stats["hits"] += 1
+        return pickle.loads(payload), stamp
+
+    def put(self, key, result, tables=(), stamp=None):
+        """
+        Store result stamped with the current versions of tables and return that stamp.
+        With `stamp` (taken before the query ran), nothing is stored and None is returned
+        if any of the tables was invalidated since.
+        """
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            payload = None   # e.g. sqlite3.Row results stay memory-only
+        else:
+            payload = (b"z" + zlib.compress(payload, 1) if len(payload) > self._COMPRESS_OVER
+                       else b"p" + payload)
+        conn = self._conn()
+        with conn:
+            current = self._versions(conn, key[0], sorted(tables))
+            if stamp is not None and current != stamp:
+                self.stats["stale_puts"] += 1
+                return None
+            if payload is None:
+                return current
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (self._digest(key), self.FORMAT_VERSION, json.dumps(current),
+                          time.time() + self.ttl, payload))
+        self.stats["writes"] += 1
+        if self.stats["writes"] % 1000 == 0:
+            self.prune()
+        return current
+
+    def invalidate_tables(self, db_path, tables):
+        """Bump the version of each table so entries reading it become stale in every process."""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO table_versions VALUES (?, ?, 1) ON CONFLICT(db_path, tbl) "
+                "DO UPDATE SET version = version + 1", [(db_path, t) for t in tables])
+
+    def prune(self):
+        """Delete expired entries, then the soonest-expiring ones beyond max_entries."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+            conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                         "ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+
+class QueryCache:
+    """
+    Thread-safe LRU result cache bounded by entry count and approximate bytes,
+    with a per-entry TTL and table-level invalidation.
+    An optional `disk` DiskCacheTier is consulted on memory misses and written through;
+    memory entries then carry the disk tier's version stamp, rechecked on each hit, so
+    writes committed by other processes invalidate them too.
+    Callers take generation() before running a query and pass it to put(), so a
+    result read before an invalidation of its tables is never stored afterwards.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300.0, disk=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = disk
+        self._entries = OrderedDict()   # key -> (result, size, expires_at, tables, disk stamp)
+        self._by_table = {}             # (db_path, table) -> set of keys
+        self._generations = {}          # (db_path, table) -> invalidation count
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0,
+                      "expirations": 0, "invalidations": 0, "stale_puts": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _drop(self, key):
+        result, size, _, tables, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[0], table)]
+
+    def get(self, key, default=None):
+        """Return the cached result for key (refreshing its LRU position) or default."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._drop(key)
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[4] is None:
+                    self.stats["hits"] += 1
+                    return entry[0]
+        if entry is not None:
+            # Stamped by the disk tier: check no process wrote its tables since
+            if self.disk.is_current(key[0], entry[4]):
+                with self._lock:
+                    self.stats["hits"] += 1
+                return entry[0]
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._drop(key)
+                    self.stats["invalidations"] += 1
+        with self._lock:
+            self.stats["misses"] += 1
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                result, stamp = found
+                self.put(key, result, tuple(stamp), persist=False, generation=(None, stamp))
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return result
+        return default
+
+    def _generation(self, db_path, tables):
+        return tuple(self._generations.get((db_path, t), 0) for t in sorted(tables))
+
+    def generation(self, db_path, tables):
+        """Snapshot of the invalidation state of tables (memory and disk), to pass to put()."""
+        stamp = self.disk.versions(db_path, tables) if self.disk is not None else None
+        with self._lock:
+            return self._generation(db_path, tables), stamp
+
+    def put(self, key, result, tables=(), persist=True, generation=None):
+        """
+        Store result under key (key[0] must be the database path). With `generation`
+        (taken before the query ran), the result is dropped if any of its tables was
+        invalidated since.
+        """
+        counters, stamp = generation if generation is not None else (None, None)
+        if counters is not None:
+            with self._lock:
+                if self._generation(key[0], tables) != counters:
+                    self.stats["stale_puts"] += 1
+                    return
+        if self.disk is not None:
+            if persist:
+                stamp = self.disk.put(key, result, tables, stamp)
+                if stamp is None:
+                    with self._lock:
+                        self.stats["stale_puts"] += 1
+                    return
+            elif stamp is None:
+                stamp = self.disk.versions(key[0], tables)
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if counters is not None and self._generation(key[0], tables) != counters:
+                self.stats["stale_puts"] += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (result, size, time.monotonic() + self.ttl, tuple(tables),
+                                  stamp)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault((key[0], table), set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_tables(self, db_path, tables):
+        """Drop every cached result of db_path that reads any of tables."""
+        if self.disk is not None:
+            self.disk.invalidate_tables(db_path, tables)
+        with self._lock:
+            for table in tables:
+                slot = (db_path, table)
+                self._generations[slot] = self._generations.get(slot, 0) + 1
+                for key in list(self._by_table.get(slot, ())):
+                    self._drop(key)
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+
+# Set QUERY_CACHE_DISK=/path/to/cache.db to enable the persistent second tier
+query_cache = QueryCache(
+    disk=DiskCacheTier(os.environ["QUERY_CACHE_DISK"]) if os.getenv("QUERY_CACHE_DISK") else None)
+
+# Writes committed through `transactional` invalidate cached reads of the tables they touched
+_transactional = __import__('2-transactional')
+_transactional.register_commit_listener(query_cache.invalidate_tables)
+db_path_of = _transactional.db_path_of
 
 def with_db_connection(func):
-    """Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward."""
+    """
+    Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward.
+    `async def` functions get an aiosqlite connection instead.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
@@ -15,26 +329,136 @@ def with_db_connection(func):
             conn.close()
     return wrapper
 
+def _query_key(args, kwargs):
+    """(query, params, extra kwargs) for a cacheable call, or None to bypass the cache."""
+    # Extract the SQL string from kwargs or positional args
+    if "query" in kwargs:
+        query = kwargs["query"]
+        params = args
+    else:
+        # Expecting signature (conn, query, *rest)
+        if len(args) < 1 or not isinstance(args[0], str):
+            # If we cannot determine the query, fall back to calling without cache
+            return None
+        query, params = args[0], args[1:]
+    keyword = query.split(None, 1)[0].upper() if query.strip() else ""
+    if keyword not in ("SELECT", "WITH"):
+        return None
+    extra = tuple(sorted((k, v) for k, v in kwargs.items() if k != "query"))
+    try:
+        hash((params, extra))
+    except TypeError:
+        # Unhashable parameters: don't cache
+        return None
+    return query, params, extra
+
+
+# Seconds a caller waits for another caller's in-flight execution of the same query
+SINGLE_FLIGHT_TIMEOUT = 30.0
+
+
+class _Flight:
+    """One in-flight execution that concurrent callers with the same key wait on."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Single-flight registries: key -> the one in-flight execution for that key
+_inflight = {}
+_inflight_lock = threading.Lock()
+_async_inflight = {}
+
+
 def cache_query(func):
-    """Cache results based on the SQL query string passed as 'query' (kwarg or positional)."""
+    """
+    Cache results keyed on (database path, SQL string passed as 'query', remaining arguments).
+    Only SELECT/WITH queries are cached; see QueryCache for bounds, TTL and invalidation.
+    Concurrent misses on the same key (threads, or tasks for `async def` functions using an
+    aiosqlite connection) wait for a single execution and share its result or exception,
+    raising TimeoutError after SINGLE_FLIGHT_TIMEOUT seconds.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            parts = _query_key(args, kwargs)
+            if parts is None:
+                return await func(conn, *args, **kwargs)
+            key = (await _transactional.adb_path_of(conn),) + parts
+            while True:
+                result = query_cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    return result
+                inflight = _async_inflight.get(key)
+                if inflight is None:
+                    break
+                try:
+                    return await asyncio.wait_for(asyncio.shield(inflight), SINGLE_FLIGHT_TIMEOUT)
+                except asyncio.CancelledError:
+                    # The leader was cancelled (not us): try again
+                    if not inflight.cancelled() or asyncio.current_task().cancelling():
+                        raise
+
+            inflight = _async_inflight[key] = asyncio.get_running_loop().create_future()
+            tables = {t.lower() for t in _READ_RE.findall(parts[0])}
+            generation = query_cache.generation(key[0], tables)
+            try:
+                result = await func(conn, *args, **kwargs)
+            except asyncio.CancelledError:
+                inflight.cancel()
+                raise
+            except Exception as exc:
+                inflight.set_exception(exc)
+                inflight.exception()   # mark retrieved when nobody was waiting
+                raise
+            finally:
+                del _async_inflight[key]
+            query_cache.put(key, result, tables, generation=generation)
+            inflight.set_result(result)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        # Extract the SQL string from kwargs or positional args
-        if "query" in kwargs:
-            key = kwargs["query"]
-        else:
-            # Expecting signature (conn, query, *rest)
-            if len(args) < 1 or not isinstance(args[0], str):
-                # If we cannot determine the query, fall back to calling without cache
-                return func(conn, *args, **kwargs)
-            key = args[0]
-
-        if key in query_cache:
-            return query_cache[key]
-        result = func(conn, *args, **kwargs)
-        # Shallow copy is fine for list of tuples result; store as-is
-        query_cache[key] = result
-        return result
+        parts = _query_key(args, kwargs)
+        if parts is None:
+            return func(conn, *args, **kwargs)
+        key = (db_path_of(conn),) + parts
+
+        result = query_cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        with _inflight_lock:
+            flight = _inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _inflight[key] = _Flight()
+        if not leader:
+            # Another thread is already running this query: share its outcome
+            if not flight.done.wait(SINGLE_FLIGHT_TIMEOUT):
+                raise TimeoutError(f"Timed out waiting for in-flight query: {parts[0]!r}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        tables = {t.lower() for t in _READ_RE.findall(parts[0])}
+        generation = query_cache.generation(key[0], tables)
+        try:
+            result = func(conn, *args, **kwargs)
+            query_cache.put(key, result, tables, generation=generation)
+            flight.result = result
+            return result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with _inflight_lock:
+                del _inflight[key]
+            flight.done.set()
     return wrapper
 
 
@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import functools
+import threading
+
+# Applied once per new connection, not on every call
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+)
+
+
+class SQLiteConnectionPool:
+    """
+    Per-thread pool of warm sqlite3 connections to one database file.
+    Each thread reuses its own connection (sqlite3 connections are not shared
+    across threads); PRAGMAs run once when the connection is created and the
+    connection's prepared-statement cache survives between calls.
+    """
+
+    def __init__(self, db_path='users.db', pragmas=DEFAULT_PRAGMAS, cached_statements=128):
+        self.db_path = db_path
+        self.pragmas = tuple(pragmas)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        with self._lock:
+            self._all.append(conn)
+            self.stats["created"] += 1
+        return conn
+
+    def get(self):
+        """
+        Return the calling thread's connection, creating it on first use.
+        Nested calls on one thread share it; each get() is paired with a release().
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.depth = 0
+        else:
+            with self._lock:
+                self.stats["reused"] += 1
+        self._local.depth += 1
+        return conn
+
+    def release(self, conn):
+        """
+        Roll back anything left uncommitted, as closing the connection would have,
+        once the outermost checkout on this thread is released (an inner call must
+        not discard its caller's open transaction).
+        """
+        self._local.depth -= 1
+        if self._local.depth == 0 and conn.in_transaction:
+            conn.rollback()
+
+    def close_all(self):
+        """Close every connection this pool has opened (all threads)."""
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Owned by another thread; it is closed when that thread exits
+                    pass
+            self._all.clear()
+        self._local = threading.local()
+
+
+default_pool = SQLiteConnectionPool(os.getenv("DB_PATH", "users.db"))
+
+
+def with_db_connection(func=None, *, pool=None):
+    """
+    Drop-in pooled replacement for with_db_connection: pass the thread's warm
+    connection as the first arg instead of opening/closing one per call.
+    Use as @with_db_connection or @with_db_connection(pool=SQLiteConnectionPool('other.db')).
+    """
+    if func is None:
+        return functools.partial(with_db_connection, pool=pool)
+    source = pool or default_pool
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = source.get()
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            source.release(conn)
+    return wrapper
+
+
+# The existing decorated functions, unchanged, on top of the pool
+get_user_by_id = with_db_connection(__import__('1-with_db_connection').get_user_by_id.__wrapped__)
+update_user_email = with_db_connection(__import__('2-transactional').update_user_email.__wrapped__)
+
+
+def _per_call_us(fn, calls, **kwargs):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(**kwargs)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    # Compare per-call latency of the original and pooled decorators
+    calls = int(os.getenv("CALLS", "2000"))
+    plain = __import__('1-with_db_connection').get_user_by_id
+    plain_us = _per_call_us(plain, calls, user_id=1)
+    pooled_us = _per_call_us(get_user_by_id, calls, user_id=1)
+    print(f"get_user_by_id: {plain_us:.1f} us/call -> {pooled_us:.1f} us/call pooled "
+          f"({plain_us / pooled_us:.1f}x)")
+    print(get_user_by_id(user_id=1))
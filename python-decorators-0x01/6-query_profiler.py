@@ -0,0 +1,302 @@
+import re
+import json
+import time
+import random
+import sqlite3
+import logging
+import functools
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Normalization rules turning SQL text into a fingerprint shared by all its parameter values
+_FINGERPRINT_RULES = (
+    (re.compile(r"--[^\n]*|/\*.*?\*/", re.S), " "),       # comments
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                 # string literals
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),              # numbers
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),  # IN (...) lists of any length
+    (re.compile(r"\s+"), " "),                            # whitespace
+)
+
+
+def fingerprint(sql):
+    """Normalize a statement so calls that differ only by literals share one entry."""
+    for pattern, repl in _FINGERPRINT_RULES:
+        sql = pattern.sub(repl, sql)
+    return sql.strip().rstrip(";").lower()
+
+
+class _Stats:
+    """
+    Aggregates for one fingerprint; latency percentiles come from a bounded reservoir.
+    Each call's latency lives in a one-element list so its fetches can add to it later.
+    """
+
+    __slots__ = ("count", "total", "max", "rows", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = []   # [seconds] cells of the sampled calls
+
+
+class QueryProfiler:
+    """
+    In-memory statement profiler: per-fingerprint count, total/max time, rows and
+    p50/p95/p99 latency. Every `dump_interval` seconds a background thread (started
+    on the first record) writes the report to `dump_path` (JSON) or logs it.
+    """
+
+    def __init__(self, reservoir_size=1024, dump_interval=60.0, dump_path=None, top=20):
+        self.reservoir_size = reservoir_size
+        self.dump_interval = dump_interval
+        self.dump_path = dump_path
+        self.top = top
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._dumper = None
+        self._stop = threading.Event()
+
+    def _start_dumper(self):
+        with self._lock:
+            if self._dumper is None:
+                self._stop.clear()
+                self._dumper = threading.Thread(target=self._dump_loop, name="query-profiler-dump",
+                                                daemon=True)
+                self._dumper.start()
+
+    def _dump_loop(self):
+        while not self._stop.wait(self.dump_interval):
+            try:
+                self.dump()
+            except Exception:
+                logger.exception("query profiler dump failed")
+
+    def close(self):
+        """Stop the periodic dump thread."""
+        self._stop.set()
+        dumper, self._dumper = self._dumper, None
+        if dumper is not None:
+            dumper.join()
+
+    def record(self, sql, seconds, rows=0, call=None):
+        """
+        Add one execution of sql and return its handle. Passing a handle as `call`
+        adds fetch time/rows to that execution instead (sql is then ignored).
+        """
+        if self._dumper is None and self.dump_interval:
+            self._start_dumper()
+        fp, cell = call if call is not None else (fingerprint(sql), [seconds])
+        with self._lock:
+            st = self._stats.get(fp)
+            if st is None:
+                st = self._stats[fp] = _Stats()
+            if call is None:
+                st.count += 1
+                # Reservoir sampling keeps a uniform sample of latencies
+                if len(st.samples) < self.reservoir_size:
+                    st.samples.append(cell)
+                else:
+                    i = random.randrange(st.count)
+                    if i < self.reservoir_size:
+                        st.samples[i] = cell
+            else:
+                cell[0] += seconds
+            st.total += seconds
+            st.rows += rows
+            st.max = max(st.max, cell[0])
+        return fp, cell
+
+    def report(self):
+        """Per-fingerprint aggregates, slowest total time first."""
+        with self._lock:
+            items = [(fp, st.count, st.total, st.max, st.rows,
+                      sorted(cell[0] for cell in st.samples))
+                     for fp, st in self._stats.items()]
+        out = []
+        for fp, count, total, worst, rows, samples in items:
+            def pct(q):
+                return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else None
+            out.append({
+                "query": fp, "count": count, "total_ms": total * 1000,
+                "mean_ms": total / count * 1000 if count else None,
+                "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+                "max_ms": worst * 1000, "rows": rows,
+            })
+        out.sort(key=lambda r: r["total_ms"], reverse=True)
+        return out
+
+    def dump(self):
+        """Write the top entries of report() to dump_path, or log them."""
+        report = self.report()[:self.top]
+        if self.dump_path:
+            with open(self.dump_path, "w") as f:
+                json.dump(report, f, indent=2)
+        else:
+            for r in report:
+                logger.info("%8.1f ms total  %5d calls  p95 %.2f ms  %s",
+                            r["total_ms"], r["count"], r["p95_ms"] or 0.0, r["query"])
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ProfiledCursor:
+    """Cursor proxy timing execute/executemany and the fetches that follow them."""
+
+    _own = ("_cursor", "_profiler", "_call")
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._call = None   # profiler handle of the last execute, for its fetches
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as arraysize or row_factory belong to the real cursor
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        # Time only the row fetches, and report them once when iteration ends
+        rows, seconds = 0, 0.0
+        it = iter(self._cursor)
+        try:
+            while True:
+                start = time.perf_counter()
+                row = next(it, None)
+                seconds += time.perf_counter() - start
+                if row is None:
+                    return
+                rows += 1
+                yield row
+        finally:
+            if self._call is not None:
+                self._profiler.record(None, seconds, rows, call=self._call)
+
+    def _timed(self, sql, call, *args):
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            self._call = self._profiler.record(sql, time.perf_counter() - start)
+
+    def execute(self, sql, params=()):
+        self._timed(sql, self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._timed(sql, self._cursor.executemany, sql, seq_of_params)
+        return self
+
+    def _fetch(self, call, *args):
+        start = time.perf_counter()
+        result = call(*args)
+        if self._call is not None:
+            if result is None:
+                rows = 0
+            elif isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = 1
+            self._profiler.record(None, time.perf_counter() - start, rows, call=self._call)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+
+class ProfiledConnection:
+    """Connection proxy whose cursors (and conn.execute) report to a QueryProfiler."""
+
+    _own = ("_conn", "_profiler")
+
+    def __init__(self, conn, profiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # row_factory, isolation_level, text_factory, ... must reach the real connection
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def cursor(self, *args):
+        return ProfiledCursor(self._conn.cursor(*args), self._profiler)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+profiler = QueryProfiler()
+
+
+def profile_queries(func=None, *, using=None):
+    """
+    Profile every statement the decorated function runs on its connection (first arg).
+    Place it under with_db_connection; replaces log_queries for finding slow queries.
+    """
+    if func is None:
+        return functools.partial(profile_queries, using=using)
+    target = using or profiler
+
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        return func(ProfiledConnection(conn, target), *args, **kwargs)
+    return wrapper
+
+
+def with_db_connection(func):
+    """Open a sqlite3 connection to 'users.db', pass it as the first arg, and close it afterward."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect('users.db')
+        try:
+            result = func(conn, *args, **kwargs)
+            return result
+        finally:
+            conn.close()
+    return wrapper
+
+
+@with_db_connection
+@profile_queries
+def fetch_all_users(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    for age in (20, 30, 40):
+        fetch_all_users(query=f"SELECT * FROM users WHERE age > {age}")
+    fetch_all_users(query="SELECT * FROM users")
+    profiler.dump()
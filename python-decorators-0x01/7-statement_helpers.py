@@ -0,0 +1,119 @@
+import re
+from itertools import islice
+
+_pooled = __import__('5-pooled_connection')
+transactional = __import__('2-transactional').transactional
+
+# Identifiers are interpolated into SQL, so only plain names are accepted
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# sqlite3 keeps compiled statements per connection, keyed by SQL text (LRU of this size).
+# A warm pooled connection keeps that cache between calls; a fresh connection per call does not.
+STATEMENT_CACHE_SIZE = 256
+
+statement_pool = _pooled.SQLiteConnectionPool(
+    _pooled.default_pool.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+
+
+def with_db_connection(func=None, *, pool=None):
+    """
+    with_db_connection whose connections keep their prepared-statement cache between calls
+    (warm per-thread connection with a STATEMENT_CACHE_SIZE-entry statement cache).
+    """
+    return _pooled.with_db_connection(func, pool=pool or statement_pool)
+
+
+def _check_identifiers(*names):
+    for name in names:
+        if not _IDENTIFIER_RE.match(name):
+            raise ValueError(f"Invalid SQL identifier: {name!r}")
+
+
+def executemany_chunked(conn, sql, rows, chunk_size=1000):
+    """
+    Run one statement over an iterable of parameter tuples with executemany, chunk_size
+    rows at a time, so a generator input is never materialized. Returns rows affected.
+    """
+    cursor = conn.cursor()
+    affected = 0
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return affected
+            cursor.executemany(sql, chunk)
+            affected += cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def bulk_insert(conn, table, columns, rows, chunk_size=1000, on_conflict=None):
+    """
+    INSERT rows (tuples in `columns` order) into table with executemany.
+    on_conflict: None, "IGNORE" or "REPLACE" (INSERT OR ...).
+    """
+    _check_identifiers(table, *columns)
+    if on_conflict is not None and on_conflict.upper() not in ("IGNORE", "REPLACE"):
+        raise ValueError("on_conflict must be None, 'IGNORE' or 'REPLACE'")
+    verb = "INSERT" if on_conflict is None else f"INSERT OR {on_conflict.upper()}"
+    sql = (f"{verb} INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join('?' * len(columns))})")
+    return executemany_chunked(conn, sql, rows, chunk_size)
+
+
+def bulk_update(conn, table, set_columns, key_column, rows, chunk_size=1000):
+    """
+    UPDATE table SET set_columns... WHERE key_column = ? for every row; each row is
+    (*new values in set_columns order, key value).
+    """
+    _check_identifiers(table, key_column, *set_columns)
+    assignments = ", ".join(f"{col} = ?" for col in set_columns)
+    sql = f"UPDATE {table} SET {assignments} WHERE {key_column} = ?"
+    return executemany_chunked(conn, sql, rows, chunk_size)
+
+
+def fetch_iter(conn, query, params=(), size=500):
+    """Generator streaming query results with fetchmany(size) instead of fetchall()."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+@with_db_connection
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+@with_db_connection
+@transactional
+def update_user_emails(conn, pairs):
+    """Bulk version of update_user_email: pairs of (new_email, user_id), one transaction."""
+    return bulk_update(conn, "users", ["email"], "id", pairs)
+
+
+@with_db_connection
+def count_users_older_than(conn, age):
+    """Stream the matching rows instead of materializing them."""
+    return sum(1 for _ in fetch_iter(conn, "SELECT id FROM users WHERE age > ?", (age,)))
+
+
+if __name__ == "__main__":
+    print(get_user_by_id(user_id=1))
+    # Other tasks' demos read users.db: write the original emails back afterwards
+    users = filter(None, (get_user_by_id(user_id=i) for i in range(1, 11)))
+    originals = [(email, user_id) for user_id, _, email, _ in users]
+    try:
+        print(update_user_emails((f"user{i}@example.com", i) for _, i in originals), "emails updated")
+    finally:
+        update_user_emails(originals)
+    print(count_users_older_than(age=40), "users older than 40")
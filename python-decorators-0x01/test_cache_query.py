@@ -0,0 +1,247 @@
+import os
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+cache_module = __import__('4-cache_query')
+transactional = __import__('2-transactional').transactional
+cache_query = cache_module.cache_query
+query_cache = cache_module.query_cache
+QueryCache = cache_module.QueryCache
+DiskCacheTier = cache_module.DiskCacheTier
+
+
+@transactional
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+
+class CacheQueryTestCase(unittest.TestCase):
+    """Base: a scratch users.db and an empty query_cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users "
+                         "(id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                             [(i, f"user{i}", f"user{i}@x.io", 20 + i) for i in range(1, 6)])
+        query_cache.clear()
+        self.conns = []
+
+    def tearDown(self):
+        for conn in self.conns:
+            conn.close()
+        query_cache.clear()
+        self.tmp.cleanup()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conns.append(conn)
+        return conn
+
+
+class TestCacheQuery(CacheQueryTestCase):
+    """Tests for cache_query"""
+
+    def test_second_call_is_cached(self):
+        """The same query and parameters run once"""
+        calls = []
+
+        @cache_query
+        def read(conn, query):
+            calls.append(query)
+            return conn.execute(query).fetchall()
+
+        conn = self.connect()
+        first = read(conn, query="SELECT email FROM users WHERE id = 1")
+        self.assertEqual(read(conn, query="SELECT email FROM users WHERE id = 1"), first)
+        self.assertEqual(len(calls), 1)
+
+    def test_commit_invalidates_cached_reads(self):
+        """A transactional write drops cached reads of the table it wrote"""
+        @cache_query
+        def read(conn, query):
+            return conn.execute(query).fetchall()
+
+        conn = self.connect()
+        query = "SELECT email FROM users WHERE id = 1"
+        self.assertEqual(read(conn, query=query), [("user1@x.io",)])
+        set_email(self.connect(), 1, "new@x.io")
+        self.assertEqual(read(conn, query=query), [("new@x.io",)])
+
+    def test_with_query_is_cached_and_invalidated(self):
+        """CTE reads are cached and dropped when a table they read is written"""
+        calls = []
+
+        @cache_query
+        def read(conn, query):
+            calls.append(query)
+            return conn.execute(query).fetchall()
+
+        conn = self.connect()
+        query = "WITH one AS (SELECT email FROM users WHERE id = 1) SELECT email FROM one"
+        self.assertEqual(read(conn, query=query), [("user1@x.io",)])
+        self.assertEqual(read(conn, query=query), [("user1@x.io",)])
+        self.assertEqual(len(calls), 1)
+        set_email(self.connect(), 1, "new@x.io")
+        self.assertEqual(read(conn, query=query), [("new@x.io",)])
+        self.assertEqual(len(calls), 2)
+
+    def test_commit_during_read_is_not_cached(self):
+        """A result read before a concurrent commit is not stored after it"""
+        writer = self.connect()
+        hooks = [lambda: set_email(writer, 1, "new@x.io")]
+
+        @cache_query
+        def read(conn, query):
+            rows = conn.execute(query).fetchall()
+            while hooks:
+                # Another writer commits between the read and the cache put
+                hooks.pop()()
+            return rows
+
+        conn = self.connect()
+        query = "SELECT email FROM users WHERE id = 1"
+        self.assertEqual(read(conn, query=query), [("user1@x.io",)])
+        self.assertEqual(read(conn, query=query), [("new@x.io",)])
+        self.assertGreaterEqual(query_cache.stats["stale_puts"], 1)
+
+
+class TestSingleFlight(CacheQueryTestCase):
+    """Tests for cache_query's single-flight handling of concurrent misses"""
+
+    def run_threads(self, read, count=8):
+        """Call read() from `count` threads at once; return (results, errors)."""
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(read(self.connect(), query="SELECT * FROM users"))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results, errors
+
+    def test_concurrent_misses_run_once(self):
+        """Threads missing on the same key share one execution"""
+        calls = []
+        release = threading.Event()
+
+        @cache_query
+        def read(conn, query):
+            calls.append(query)
+            release.wait(5)
+            return conn.execute(query).fetchall()
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self.run_threads(read)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_concurrent_misses_share_the_error(self):
+        """Waiters get the leader's exception and nothing is cached"""
+        calls = []
+        release = threading.Event()
+
+        @cache_query
+        def read(conn, query):
+            calls.append(query)
+            release.wait(5)
+            raise sqlite3.OperationalError("database is locked")
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self.run_threads(read)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(query_cache), 0)
+
+    @unittest.skipIf(aiosqlite is None, "aiosqlite is not installed")
+    def test_async_concurrent_misses_run_once(self):
+        """Tasks missing on the same key share one execution"""
+        calls = []
+
+        @cache_query
+        async def read(conn, query):
+            calls.append(query)
+            await asyncio.sleep(0.1)
+            async with conn.execute(query) as cursor:
+                return await cursor.fetchall()
+
+        async def main():
+            async with aiosqlite.connect(self.db_path) as conn:
+                return await asyncio.gather(
+                    *(read(conn, query="SELECT * FROM users") for _ in range(8)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == results[0] for r in results))
+
+
+class TestDiskCacheTier(unittest.TestCase):
+    """Tests for QueryCache with a DiskCacheTier shared between caches (as between processes)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.disk_path = os.path.join(self.tmp.name, "query_cache.db")
+        self.key = ("/db/users.db", "SELECT * FROM users", (), ())
+        self.rows = [(1, "user1@x.io")]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cache(self):
+        return QueryCache(disk=DiskCacheTier(self.disk_path))
+
+    def test_survives_restart(self):
+        """A new cache on the same file finds entries written by an earlier one"""
+        self.cache().put(self.key, self.rows, {"users"})
+        restarted = self.cache()
+        self.assertEqual(restarted.get(self.key), self.rows)
+        self.assertEqual(restarted.stats["disk_hits"], 1)
+
+    def test_other_process_write_invalidates_memory_entry(self):
+        """A memory hit is rechecked against table versions bumped elsewhere"""
+        here, there = self.cache(), self.cache()
+        here.put(self.key, self.rows, {"users"})
+        self.assertEqual(here.get(self.key), self.rows)
+        there.invalidate_tables("/db/users.db", {"users"})
+        self.assertIsNone(here.get(self.key))
+        self.assertIsNone(there.get(self.key))
+
+    def test_other_tables_do_not_invalidate(self):
+        """Writes to an unrelated table keep the entry"""
+        here, there = self.cache(), self.cache()
+        here.put(self.key, self.rows, {"users"})
+        there.invalidate_tables("/db/users.db", {"orders"})
+        self.assertEqual(here.get(self.key), self.rows)
+
+    def test_write_during_read_is_not_stored(self):
+        """A result read before another process's write is stored in neither tier"""
+        here, there = self.cache(), self.cache()
+        generation = here.generation("/db/users.db", {"users"})
+        there.invalidate_tables("/db/users.db", {"users"})
+        here.put(self.key, self.rows, {"users"}, generation=generation)
+        self.assertIsNone(here.get(self.key))
+        self.assertIsNone(self.cache().get(self.key))
+        self.assertEqual(here.stats["stale_puts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
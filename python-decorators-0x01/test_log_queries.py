@@ -0,0 +1,97 @@
+import logging
+import unittest
+from unittest import mock
+
+log_module = __import__('0-log_queries')
+log_queries = log_module.log_queries
+
+
+class FakeClock:
+    """Stands in for the time module in the rate limiter."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogQueries(unittest.TestCase):
+    """Tests for log_queries throttling"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(log_module, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_logged(self, func, calls):
+        """Number of log lines written by `calls` calls of func."""
+        with self.assertLogs(log_module.logger, "INFO") as logs:
+            log_module.logger.info("start")
+            for _ in range(calls):
+                func(query="SELECT 1")
+        return len(logs.output) - 1
+
+    def test_logs_every_call_by_default(self):
+        """Without throttling each call logs its query"""
+        fetch = log_queries(lambda query: query)
+        with self.assertLogs(log_module.logger, "INFO") as logs:
+            self.assertEqual(fetch(query="SELECT * FROM users"), "SELECT * FROM users")
+        self.assertIn("Executing SQL: SELECT * FROM users", logs.output[0])
+
+    def test_sample_every(self):
+        """sample_every=N logs the first call and then one in N"""
+        fetch = log_queries(sample_every=3)(lambda query: query)
+        self.assertEqual(self.run_logged(fetch, 9), 3)
+        self.assertEqual(self.run_logged(fetch, 1), 1)
+
+    def test_max_per_second(self):
+        """max_per_second allows a burst of that size, then refills over time"""
+        fetch = log_queries(max_per_second=2)(lambda query: query)
+        self.assertEqual(self.run_logged(fetch, 5), 2)
+        self.clock.now += 0.5
+        self.assertEqual(self.run_logged(fetch, 5), 1)
+        self.clock.now += 10
+        self.assertEqual(self.run_logged(fetch, 5), 2)
+
+
+class TestEnableAsyncLogging(unittest.TestCase):
+    """Tests for enable_async_logging"""
+
+    def setUp(self):
+        self.target = logging.getLogger("test_log_queries.async")
+        self.target.setLevel(logging.INFO)
+        self.collect = _Collect()
+        self.target.handlers = [self.collect]
+
+    def tearDown(self):
+        listener = log_module._listeners.pop(self.target, None)
+        if listener is not None:
+            listener.stop()
+        self.target.handlers = []
+        self.target.propagate = True
+
+    def test_second_call_returns_the_running_listener(self):
+        """Enabling twice keeps one queue and delivers each record once"""
+        listener = log_module.enable_async_logging(self.target)
+        self.assertIs(log_module.enable_async_logging(self.target), listener)
+        (handler,) = self.target.handlers
+        self.assertIsInstance(handler, log_module._DeferredQueueHandler)
+        self.target.info("Executing SQL: %s", "SELECT 1")
+        log_module._listeners.pop(self.target).stop()   # flushes the queue
+        (record,) = self.collect.records
+        self.assertEqual(record.getMessage(), "Executing SQL: SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
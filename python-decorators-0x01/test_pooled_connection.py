@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+pooled_module = __import__('5-pooled_connection')
+SQLiteConnectionPool = pooled_module.SQLiteConnectionPool
+with_db_connection = pooled_module.with_db_connection
+
+
+class TestSQLiteConnectionPool(unittest.TestCase):
+    """Tests for SQLiteConnectionPool and the pooled with_db_connection"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+            conn.execute("INSERT INTO users VALUES (1, 'user1@x.io')")
+        self.pool = SQLiteConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.tmp.cleanup()
+
+    def test_reuses_thread_connection(self):
+        """Calls on one thread share a connection with the PRAGMAs applied once"""
+        @with_db_connection(pool=self.pool)
+        def conn_and_mode(conn):
+            return conn, conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+        first, mode = conn_and_mode()
+        second, _ = conn_and_mode()
+        self.assertIs(first, second)
+        self.assertEqual(mode, "wal")
+        self.assertEqual(self.pool.stats, {"created": 1, "reused": 1})
+
+    def test_threads_get_their_own_connection(self):
+        """Each thread gets a distinct connection"""
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(self.pool.get()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(seen[0], self.pool.get())
+        self.assertEqual(self.pool.stats["created"], 2)
+
+    def test_release_rolls_back_uncommitted_work(self):
+        """Work left uncommitted is rolled back when the call returns"""
+        @with_db_connection(pool=self.pool)
+        def set_email(conn):
+            conn.execute("UPDATE users SET email = 'new@x.io' WHERE id = 1")
+
+        set_email()
+        conn = self.pool.get()
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT email FROM users").fetchone()[0], "user1@x.io")
+
+    def test_nested_call_keeps_outer_transaction(self):
+        """An inner pooled call returning does not roll back the outer call's work"""
+        @with_db_connection(pool=self.pool)
+        def get_email(conn, user_id):
+            return conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+        @with_db_connection(pool=self.pool)
+        def add_user(conn):
+            conn.execute("INSERT INTO users VALUES (2, 'user2@x.io')")
+            email = get_email(2)
+            conn.commit()
+            return email
+
+        self.assertEqual(add_user(), "user2@x.io")
+        count = self.pool.get().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        self.assertEqual(count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+profiler_module = __import__('6-query_profiler')
+QueryProfiler = profiler_module.QueryProfiler
+ProfiledConnection = profiler_module.ProfiledConnection
+
+
+class TestQueryProfiler(unittest.TestCase):
+    """Tests for QueryProfiler and ProfiledConnection"""
+
+    def setUp(self):
+        self.profiler = QueryProfiler(dump_interval=0)
+
+    def test_fingerprint_groups_literals(self):
+        """Statements differing only by literals share one entry"""
+        self.assertEqual(profiler_module.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3)"),
+                         profiler_module.fingerprint("select *  from t where id in ('a')"))
+
+    def test_fetch_time_goes_to_its_own_call(self):
+        """Fetch time is added to the execution it belongs to, not the latest one"""
+        first = self.profiler.record("SELECT 1", 0.001)
+        self.profiler.record("SELECT 2", 0.002)
+        self.profiler.record(None, 0.010, rows=3, call=first)
+        (entry,) = self.profiler.report()
+        self.assertEqual(entry["count"], 2)
+        self.assertEqual(entry["rows"], 3)
+        self.assertAlmostEqual(entry["max_ms"], 11.0)
+        self.assertAlmostEqual(entry["p50_ms"], 11.0)
+        self.assertAlmostEqual(entry["total_ms"], 13.0)
+
+    def test_interleaved_cursors(self):
+        """Rows fetched on each cursor are counted under that cursor's statement"""
+        conn = ProfiledConnection(sqlite3.connect(":memory:"), self.profiler)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+        small, large = conn.cursor(), conn.cursor()
+        small.execute("SELECT x FROM t WHERE x < 2")
+        large.execute("SELECT x FROM t")
+        self.assertEqual(len(small.fetchall()), 2)
+        self.assertEqual(len(large.fetchall()), 10)
+        rows = {r["query"]: r["rows"] for r in self.profiler.report()}
+        self.assertEqual(rows["select x from t where x < ?"], 2)
+        self.assertEqual(rows["select x from t"], 10)
+
+    def test_iteration_is_recorded_once(self):
+        """Iterating a cursor adds its rows to the execution, not a call per row"""
+        conn = ProfiledConnection(sqlite3.connect(":memory:"), self.profiler)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+        calls = []
+        record = self.profiler.record
+        self.profiler.record = lambda *args, **kwargs: calls.append(args) or record(*args, **kwargs)
+        self.assertEqual([r[0] for r in conn.execute("SELECT x FROM t")], [0, 1, 2, 3, 4])
+        self.assertEqual(len(calls), 2)   # the execute, then the whole iteration
+        entry = {r["query"]: r for r in self.profiler.report()}["select x from t"]
+        self.assertEqual((entry["count"], entry["rows"]), (1, 5))
+
+    def test_connection_api_is_preserved(self):
+        """with-blocks and attribute writes reach the real connection"""
+        raw = sqlite3.connect(":memory:")
+        conn = ProfiledConnection(raw, self.profiler)
+        conn.row_factory = sqlite3.Row
+        self.assertIs(raw.row_factory, sqlite3.Row)
+        with conn as c:
+            c.execute("CREATE TABLE t (x INTEGER)")
+            c.execute("INSERT INTO t VALUES (1)")
+        self.assertFalse(raw.in_transaction)
+        self.assertEqual(conn.execute("SELECT x FROM t").fetchone()["x"], 1)
+
+    def test_dump_runs_off_the_calling_thread(self):
+        """The periodic dump is written by a background thread"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+            profiler = QueryProfiler(dump_interval=0.01, dump_path=path)
+            try:
+                profiler.record("SELECT 1", 0.001)
+                deadline = time.monotonic() + 2
+                while not os.path.exists(path) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                profiler.close()
+            with open(path) as f:
+                self.assertEqual(json.load(f)[0]["query"], "select ?")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import random
+import sqlite3
+import unittest
+from unittest import mock
+
+retry_module = __import__('3-retry_on_failure')
+retry_on_failure = retry_module.retry_on_failure
+RetryBudget = retry_module.RetryBudget
+transient_sqlite_error = retry_module.transient_sqlite_error
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic() instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def failing(error, calls):
+    """A function raising `error` on every call, counting calls in `calls`."""
+    def func():
+        calls.append(1)
+        raise error
+    return func
+
+
+class RetryTestCase(unittest.TestCase):
+    """Base: retry_on_failure runs against a FakeClock."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(retry_module, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestBackoffDelays(unittest.TestCase):
+    """Tests for _backoff_delays"""
+
+    def setUp(self):
+        random.seed(1234)
+
+    def take(self, strategy, delay, max_delay, n=200):
+        delays = retry_module._backoff_delays(strategy, delay, max_delay)
+        return [next(delays) for _ in range(n)]
+
+    def test_fixed(self):
+        """fixed always waits `delay`"""
+        self.assertEqual(set(self.take("fixed", 2, 30.0, 5)), {2})
+
+    def test_exponential_full_jitter_bounds(self):
+        """Attempt n waits uniform in [0, delay * 2**n], never more than max_delay"""
+        delays = self.take("exponential", 0.1, 5.0)
+        for n, pause in enumerate(delays):
+            self.assertGreaterEqual(pause, 0)
+            self.assertLessEqual(pause, min(5.0, 0.1 * 2 ** n))
+        self.assertGreater(max(delays[10:]), 2.5)   # the cap is reached, not undershot
+
+    def test_decorrelated_jitter_bounds(self):
+        """Decorrelated sleeps stay within [delay, max_delay]"""
+        delays = self.take("decorrelated", 0.1, 5.0)
+        self.assertTrue(all(0.1 <= pause <= 5.0 for pause in delays))
+        self.assertEqual(max(delays), 5.0)
+
+
+class TestRetryOnFailure(RetryTestCase):
+    """Tests for retry_on_failure"""
+
+    def test_retries_then_succeeds(self):
+        """Failures are retried with `delay` between attempts"""
+        results = [ValueError("boom"), ValueError("boom"), "ok"]
+
+        @retry_on_failure(retries=3, delay=2)
+        def flaky():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.assertEqual(flaky(), "ok")
+        self.assertEqual(self.clock.sleeps, [2, 2])
+
+    def test_gives_up_after_retries(self):
+        """The last error is re-raised after `retries` retries"""
+        calls = []
+        with self.assertRaises(ValueError):
+            retry_on_failure(retries=3, delay=1)(failing(ValueError("boom"), calls))()
+        self.assertEqual(len(calls), 4)
+
+    def test_max_total_cuts_off_retries(self):
+        """No retry is made if its sleep would pass max_total seconds"""
+        calls = []
+        with self.assertRaises(ValueError):
+            retry_on_failure(retries=10, delay=2, max_total=5)(failing(ValueError("boom"), calls))()
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.clock.sleeps, [2, 2])
+
+    def test_non_transient_errors_are_not_retried(self):
+        """retry_if=transient_sqlite_error re-raises other errors at once"""
+        for error, attempts in ((sqlite3.OperationalError("near \"SELEC\": syntax error"), 1),
+                                (sqlite3.IntegrityError("UNIQUE constraint failed"), 1),
+                                (sqlite3.OperationalError("database is locked"), 3),
+                                (sqlite3.OperationalError("database table is busy"), 3)):
+            calls = []
+            with self.assertRaises(type(error)):
+                retry_on_failure(retries=2, delay=0.1, retry_if=transient_sqlite_error)(
+                    failing(error, calls))()
+            self.assertEqual(len(calls), attempts, error)
+
+    def test_no_budget_by_default(self):
+        """Without budget=..., the shared retry_budget is not touched"""
+        before = dict(retry_module.retry_budget.stats)
+        with self.assertRaises(ValueError):
+            retry_on_failure(retries=2, delay=0)(failing(ValueError("boom"), []))()
+        self.assertEqual(retry_module.retry_budget.stats, before)
+
+    def test_exhausted_budget_stops_retries(self):
+        """Once the budget runs out, the error is re-raised without further retries"""
+        budget = RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=2)
+        calls = []
+        with self.assertRaises(ValueError):
+            retry_on_failure(retries=5, delay=1, budget=budget)(failing(ValueError("boom"), calls))()
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(budget.stats, {"calls": 1, "retries": 2, "rejected": 1})
+
+
+class TestRetryBudget(RetryTestCase):
+    """Tests for RetryBudget"""
+
+    def test_exhaustion_and_refill(self):
+        """Retries draw tokens; calls deposit `ratio` and time adds min_per_second"""
+        budget = RetryBudget(ratio=0.5, min_per_second=2.0, max_tokens=2)
+        self.assertEqual([budget.try_retry() for _ in range(3)], [True, True, False])
+        budget.record_call()
+        budget.record_call()
+        self.assertTrue(budget.try_retry())
+        self.assertFalse(budget.try_retry())
+        self.clock.now += 0.5
+        self.assertTrue(budget.try_retry())
+        self.clock.now += 60
+        self.assertEqual([budget.try_retry() for _ in range(3)], [True, True, False])
+        self.assertEqual(budget.stats, {"calls": 2, "retries": 6, "rejected": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
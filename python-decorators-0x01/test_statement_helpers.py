@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+helpers = __import__('7-statement_helpers')
+_pooled = __import__('5-pooled_connection')
+transactional_module = __import__('2-transactional')
+
+
+class _ChunkCursor:
+    """Stand-in cursor recording the size of each executemany chunk."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.rowcount = -1
+
+    def executemany(self, sql, rows):
+        self.chunks.append(len(rows))
+        self.rowcount = len(rows)
+
+    def close(self):
+        pass
+
+
+class _ChunkConnection:
+    def __init__(self):
+        self.chunks = []
+
+    def cursor(self):
+        return _ChunkCursor(self.chunks)
+
+
+class TestStatementHelpers(unittest.TestCase):
+    """Tests for executemany_chunked, bulk_insert/bulk_update and fetch_iter"""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT, age INTEGER)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_executemany_chunk_boundaries(self):
+        """Rows are sent chunk_size at a time, with the remainder in a last chunk"""
+        for count, chunks in ((0, []), (999, [999]), (1000, [1000]), (2500, [1000, 1000, 500])):
+            conn = _ChunkConnection()
+            rows = ((i,) for i in range(count))
+            self.assertEqual(helpers.executemany_chunked(conn, "INSERT ...", rows, 1000), count)
+            self.assertEqual(conn.chunks, chunks, count)
+
+    def test_bulk_insert_and_update(self):
+        """bulk_insert and bulk_update write every row and return the rows affected"""
+        rows = ((i, f"user{i}@x.io", 20 + i) for i in range(1, 8))
+        self.assertEqual(helpers.bulk_insert(self.conn, "users", ["id", "email", "age"], rows,
+                                             chunk_size=3), 7)
+        pairs = [(f"new{i}@x.io", i) for i in (2, 5)]
+        self.assertEqual(helpers.bulk_update(self.conn, "users", ["email"], "id", pairs), 2)
+        emails = dict(self.conn.execute("SELECT id, email FROM users"))
+        self.assertEqual((emails[1], emails[2], emails[5]), ("user1@x.io", "new2@x.io", "new5@x.io"))
+
+    def test_rejects_bad_identifiers(self):
+        """Table and column names that are not plain identifiers raise ValueError"""
+        for table, columns in (("users; DROP TABLE users", ["id"]), ("users", ["id", "email)"]),
+                               ("1users", ["id"]), ("users", ["e mail"])):
+            with self.assertRaises(ValueError):
+                helpers.bulk_insert(self.conn, table, columns, [])
+            with self.assertRaises(ValueError):
+                helpers.bulk_update(self.conn, table, columns, "id", [])
+        with self.assertRaises(ValueError):
+            helpers.bulk_update(self.conn, "users", ["email"], "id = 1 OR id", [])
+        with self.assertRaises(ValueError):
+            helpers.bulk_insert(self.conn, "users", ["id"], [], on_conflict="ABORT; --")
+
+    def test_fetch_iter_streams_all_rows(self):
+        """fetch_iter yields every matching row across fetchmany batches"""
+        self.conn.executemany("INSERT INTO users (email, age) VALUES (?, ?)",
+                              [(f"user{i}@x.io", i) for i in range(25)])
+        ages = [age for age, in helpers.fetch_iter(self.conn, "SELECT age FROM users WHERE age >= ?",
+                                                   (10,), size=4)]
+        self.assertEqual(ages, list(range(10, 25)))
+        self.assertEqual(list(helpers.fetch_iter(self.conn, "SELECT age FROM users WHERE age < 0")), [])
+
+
+class TestUpdateUserEmails(unittest.TestCase):
+    """Tests for the pooled update_user_emails"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                             [(i, f"user{i}", f"user{i}@x.io", 20 + i) for i in range(1, 4)])
+        self.pool = _pooled.SQLiteConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.tmp.cleanup()
+
+    def test_commit_reaches_commit_listeners(self):
+        """The bulk update commits through transactional, so listeners see the write"""
+        update = helpers.with_db_connection(helpers.update_user_emails.__wrapped__, pool=self.pool)
+        seen = []
+        transactional_module.commit_listeners.append(lambda path, tables: seen.append(tables))
+        try:
+            self.assertEqual(update([("new1@x.io", 1), ("new3@x.io", 3)]), 2)
+        finally:
+            transactional_module.commit_listeners.pop()
+        self.assertEqual(seen, [frozenset({"users"})])
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT email FROM users WHERE id = 3").fetchone()[0],
+                             "new3@x.io")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+transactional_module = __import__('2-transactional')
+transactional = transactional_module.transactional
+GroupCommitWriter = transactional_module.GroupCommitWriter
+
+
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+    return user_id
+
+
+def fail(conn):
+    conn.execute("UPDATE users SET email = 'bad' WHERE id = 1")
+    raise ValueError("boom")
+
+
+class TransactionalTestCase(unittest.TestCase):
+    """Base: a scratch users.db with five users."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+            conn.executemany("INSERT INTO users VALUES (?, ?)",
+                             [(i, f"user{i}@x.io") for i in range(1, 6)])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def emails(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT id, email FROM users"))
+        finally:
+            conn.close()
+
+
+class TestTransactional(TransactionalTestCase):
+    """Tests for transactional"""
+
+    def test_rolls_back_on_error(self):
+        """A raising function leaves no writes behind"""
+        conn = sqlite3.connect(self.db_path)
+        with self.assertRaises(ValueError):
+            transactional(fail)(conn)
+        conn.close()
+        self.assertEqual(self.emails()[1], "user1@x.io")
+
+    def test_notifies_commit_listeners(self):
+        """Listeners get the database path and the tables written"""
+        seen = []
+        transactional_module.commit_listeners.append(lambda path, tables: seen.append(tables))
+        try:
+            conn = sqlite3.connect(self.db_path)
+            transactional(set_email)(conn, 1, "new@x.io")
+            conn.close()
+        finally:
+            transactional_module.commit_listeners.pop()
+        self.assertEqual(seen, [frozenset({"users"})])
+
+
+class TestGroupCommitWriter(TransactionalTestCase):
+    """Tests for GroupCommitWriter"""
+
+    def writer(self):
+        # A long max_delay so every submitted operation lands in one batch
+        return GroupCommitWriter(self.db_path, max_batch=100, max_delay=0.2)
+
+    def test_batches_operations_into_one_commit(self):
+        """Concurrent submissions share a commit and resolve to their results"""
+        with self.writer() as writer:
+            futures = [writer.submit(set_email, i, f"new{i}@x.io") for i in range(1, 6)]
+            self.assertEqual([f.result() for f in futures], [1, 2, 3, 4, 5])
+        self.assertEqual(writer.stats["commits"], 1)
+        self.assertEqual(self.emails()[5], "new5@x.io")
+
+    def test_failing_operation_is_rolled_back_alone(self):
+        """A raising operation fails its own Future; the others commit"""
+        with self.writer() as writer:
+            ok = writer.submit(set_email, 2, "new@x.io")
+            bad = writer.submit(fail)
+            self.assertEqual(ok.result(), 2)
+            with self.assertRaises(ValueError):
+                bad.result()
+        self.assertEqual(self.emails(), {**{i: f"user{i}@x.io" for i in range(1, 6)},
+                                         2: "new@x.io"})
+
+    def test_transactional_function_is_unwrapped(self):
+        """@transactional functions run inside the group transaction"""
+        update = transactional(set_email)
+        with self.writer() as writer:
+            futures = [writer.submit(update, i, f"new{i}@x.io") for i in range(1, 4)]
+            self.assertEqual([f.result() for f in futures], [1, 2, 3])
+        self.assertEqual(writer.stats, {"operations": 3, "failed": 0, "commits": 1})
+
+    def test_operation_that_commits_splits_the_batch(self):
+        """An operation calling commit() settles the batch so far as committed"""
+        def set_and_commit(conn, user_id, email):
+            set_email(conn, user_id, email)
+            conn.commit()
+            return user_id
+
+        with self.writer() as writer:
+            futures = [writer.submit(set_email, 1, "a@x.io"),
+                       writer.submit(set_and_commit, 2, "b@x.io"),
+                       writer.submit(set_email, 3, "c@x.io")]
+            self.assertEqual([f.result() for f in futures], [1, 2, 3])
+        self.assertEqual(writer.stats["commits"], 2)
+        emails = self.emails()
+        self.assertEqual((emails[1], emails[2], emails[3]), ("a@x.io", "b@x.io", "c@x.io"))
+
+    def test_operation_that_rolls_back_fails_the_batch_so_far(self):
+        """An operation calling rollback() fails itself and the operations before it"""
+        def set_and_roll_back(conn):
+            set_email(conn, 2, "b@x.io")
+            conn.rollback()
+
+        with self.writer() as writer:
+            before = writer.submit(set_email, 1, "a@x.io")
+            rolled_back = writer.submit(set_and_roll_back)
+            after = writer.submit(set_email, 3, "c@x.io")
+            with self.assertRaises(RuntimeError):
+                before.result()
+            with self.assertRaises(RuntimeError):
+                rolled_back.result()
+            self.assertEqual(after.result(), 3)
+        emails = self.emails()
+        self.assertEqual((emails[1], emails[2], emails[3]), ("user1@x.io", "user2@x.io", "c@x.io"))
+
+    def test_submit_from_many_threads(self):
+        """Operations submitted from several threads all commit"""
+        with GroupCommitWriter(self.db_path) as writer:
+            futures = []
+            threads = [threading.Thread(target=lambda i=i: futures.append(
+                writer.submit(set_email, i, f"t{i}@x.io"))) for i in range(1, 6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(sorted(f.result() for f in futures), [1, 2, 3, 4, 5])
+        self.assertEqual(self.emails()[4], "t4@x.io")
+
+
+if __name__ == "__main__":
+    unittest.main()
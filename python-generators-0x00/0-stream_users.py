@@ -10,7 +10,17 @@ Constraints from spec:
 - The function should have NO MORE THAN ONE loop
 
 We open a server-side (unbuffered) cursor to avoid loading all rows at once.
+The connection is borrowed from seed's shared pool and returned when the
+generator finishes (or is closed early).
+
+Incremental mode: stream_users_incremental(checkpoint_path) streams only the
+rows inserted or changed since the previous run. Progress is a high-water
+mark (updated_at, user_id) saved to a JSON checkpoint file while streaming,
+so a crashed run resumes where it stopped. Deleted rows are not reported.
 """
+import json
+import os
+from datetime import datetime
 import seed
 
 def stream_users():
@@ -18,18 +28,88 @@ def stream_users():
     Generator yielding user rows as dictionaries, one at a time.
     Exactly ONE loop is used (the `for row in cur` below).
     """
-    conn = seed.connect_to_prodev()
-    # dictionary=True returns dict rows; buffered=False avoids loading everything into memory
-    cur = conn.cursor(dictionary=True, buffered=False)
+    with seed.pooled_connection() as conn:
+        # dictionary=True returns dict rows; buffered=False avoids loading everything into memory
+        cur = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY user_id")
+            for row in cur:  # <-- the single loop required by the spec
+                # Normalize age for nicer printing (keep as-is if not numeric)
+                try:
+                    row["age"] = int(row["age"])
+                except Exception:
+                    pass
+                yield row
+        finally:
+            cur.close()
+
+
+def load_checkpoint(path):
+    """Return the saved (updated_at, user_id) high-water mark, or None."""
     try:
-        cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY user_id")
-        for row in cur:  # <-- the single loop required by the spec
-            # Normalize age for nicer printing (keep as-is if not numeric)
-            try:
-                row["age"] = int(row["age"])
-            except Exception:
-                pass
-            yield row
-    finally:
-        cur.close()
-        conn.close()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    return datetime.fromisoformat(data["updated_at"]), data["user_id"]
+
+
+def save_checkpoint(path, mark):
+    """Atomically persist a (updated_at, user_id) high-water mark."""
+    updated_at, user_id = mark
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": updated_at.isoformat(), "user_id": user_id}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def stream_users_incremental(checkpoint_path, checkpoint_every=1000, lag_seconds=1):
+    """
+    Generator yielding only rows changed since the last completed (or
+    checkpointed) run, ordered by (updated_at, user_id).
+
+    A row counts as processed once the consumer asks for the next one; the
+    mark is saved every `checkpoint_every` processed rows and at the end,
+    so after a crash at most `checkpoint_every` rows are delivered again.
+
+    Rows changed in the last `lag_seconds` are left for the next run, so a
+    transaction that commits late with an older timestamp is not skipped.
+    """
+    mark = load_checkpoint(checkpoint_path)
+    with seed.pooled_connection() as conn:
+        cur = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cur.execute("SELECT NOW(6) - INTERVAL %s MICROSECOND AS upper_bound",
+                        (int(lag_seconds * 1_000_000),))
+            upper = cur.fetchone()["upper_bound"]
+            sql = ("SELECT user_id, name, email, age, updated_at FROM user_data "
+                   "WHERE updated_at <= %s")
+            params = [upper]
+            if mark is not None:
+                sql += " AND (updated_at, user_id) > (%s, %s)"
+                params.extend(mark)
+            cur.execute(sql + " ORDER BY updated_at, user_id", params)
+            pending = 0
+            for row in cur:  # single loop
+                try:
+                    row["age"] = int(row["age"])
+                except Exception:
+                    pass
+                yield row
+                # The consumer came back for more: this row is processed.
+                mark = (row["updated_at"], row["user_id"])
+                pending += 1
+                if pending >= checkpoint_every:
+                    save_checkpoint(checkpoint_path, mark)
+                    pending = 0
+            if mark is not None:
+                save_checkpoint(checkpoint_path, mark)
+        except GeneratorExit:
+            # Closed early: keep the progress confirmed so far.
+            if pending:
+                save_checkpoint(checkpoint_path, mark)
+            raise
+        finally:
+            cur.close()
@@ -13,36 +13,108 @@ Requirements:
   * Loop #2 & #3 in batch_processing (for batch, for row in batch)
 
 Both functions use 'yield' / generator semantics.
+
+Columnar mode (columnar=True) yields each batch as a ColumnBatch: one
+column per field instead of one dict per row, with ages as a numeric
+array. Filters such as "age > 25" then become a single mask operation
+(NumPy when installed, itertools.compress otherwise) and a batch takes a
+fraction of the memory of dict rows. The helpers below are loop-free
+(map/zip/compress) so the 3-loop budget still holds.
 """
+from array import array
+from collections import namedtuple
+from functools import partial
+from itertools import compress
+from operator import itemgetter, lt
 import seed
 
-def stream_users_in_batches(batch_size):
+try:
+    import numpy as np
+except ImportError:  # columnar mode falls back to tuples + array('d')
+    np = None
+
+FIELDS = ("user_id", "name", "email", "age")
+
+
+class ColumnBatch(namedtuple("ColumnBatch", FIELDS)):
+    """
+    One batch stored column-wise. `age` is a float array (numpy.ndarray or
+    array('d')); the text columns are NumPy string arrays or tuples.
+    """
+    __slots__ = ()
+
+    @property
+    def size(self):
+        """Number of rows in the batch."""
+        return len(self.age)
+
+    def rows(self):
+        """
+        Iterate the batch as dict rows (same keys as the row-wise mode) holding
+        plain Python values: str for the text columns, float for age.
+        """
+        return map(dict, map(partial(zip, FIELDS), zip(*map(_to_list, self))))
+
+
+def _to_list(column):
+    """Column as a list of builtin values (NumPy scalars unwrapped)."""
+    return column.tolist() if hasattr(column, "tolist") else list(column)
+
+
+def _to_columns(rows):
+    """Transpose a list of (user_id, name, email, age) tuples into a ColumnBatch."""
+    user_ids, names, emails, ages = zip(*rows)
+    if np is not None:
+        return ColumnBatch(np.array(user_ids), np.array(names),
+                           np.array(emails), np.array(ages, dtype=float))
+    return ColumnBatch(user_ids, names, emails, array("d", ages))
+
+
+def _take(column, mask):
+    """Select the masked entries of one column, keeping its container type."""
+    if isinstance(column, array):
+        return array(column.typecode, compress(column, mask))
+    return tuple(compress(column, mask))
+
+
+def filter_by_age(batch, min_age):
+    """Return a new ColumnBatch holding only the users with age > min_age."""
+    if np is not None:
+        mask = batch.age > min_age
+        return ColumnBatch._make(map(itemgetter(mask), batch))
+    mask = list(map(partial(lt, min_age), batch.age))
+    return ColumnBatch._make(map(partial(_take, mask=mask), batch))
+
+
+def stream_users_in_batches(batch_size, columnar=False):
     """
     Yield lists of user rows in batches of size 'batch_size'.
     Loop #1: while True, fetching with fetchmany to control memory usage.
+    columnar=True yields ColumnBatch objects instead of lists of dicts.
     """
-    conn = seed.connect_to_prodev()
-    cur = conn.cursor(dictionary=True, buffered=False)
-    try:
-        cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY user_id")
-        while True:  # Loop #1
-            rows = cur.fetchmany(batch_size)
-            if not rows:
-                return  # StopIteration
-            yield rows
-    finally:
-        cur.close()
-        conn.close()
-
-def batch_processing(batch_size=50):
+    with seed.pooled_connection() as conn:
+        cur = conn.cursor(dictionary=not columnar, buffered=False)
+        try:
+            cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY user_id")
+            while True:  # Loop #1
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return  # StopIteration
+                yield _to_columns(rows) if columnar else rows
+        finally:
+            cur.close()
+
+def batch_processing(batch_size=50, columnar=False):
     """
     Process each batch and print users whose age > 25.
     Loop #2: iterate over batches
     Loop #3: iterate rows within a batch
+    In columnar mode the age filter is one vectorized mask per batch and
+    only the matching rows are turned back into dicts for printing.
     """
-    for batch in stream_users_in_batches(batch_size):   # Loop #2
-        for user in batch:                              # Loop #3
-            # Ensure we compare numerically
-            age = int(user["age"])
-            if age > 25:
+    for batch in stream_users_in_batches(batch_size, columnar):   # Loop #2
+        users = filter_by_age(batch, 25).rows() if columnar else batch
+        for user in users:                                          # Loop #3
+            # Ensure we compare numerically (already filtered if columnar)
+            if columnar or int(user["age"]) > 25:
                 print(user)
@@ -8,34 +8,84 @@ Lazy loading paginated data using a generator.
 We provide:
 - paginate_users(page_size, offset): returns ONE page (list of dict rows).
 - lazypaginate(page_size): generator that yields pages lazily.
+- keyset_paginate(page_size, cursor=None): same page-by-page semantics, but
+  seeks on an indexed key (WHERE user_id > last_seen) over ONE connection,
+  so every page costs the same no matter how deep it is. Each page carries
+  a resumable `cursor` token.
+- lazypaginate(page_size, prefetch=K): reads up to K pages ahead on a
+  background thread, so DB time overlaps with the consumer's work.
 
 Constraints:
 - Exactly ONE loop inside lazypaginate().
 - Keep alias `lazy_pagination` for 3-main.py.
 """
+import base64
+import json
+import queue
+import threading
+import time
 import seed
 
+# Keyset pagination needs a unique, indexed sort key (PRIMARY KEY / UNIQUE).
+SEEK_KEYS = ("user_id", "email")
+
+
+class Page(list):
+    """
+    A page of rows (a plain list) plus the `cursor` token that resumes
+    pagination right after its last row.
+    """
+
+    def __init__(self, rows, cursor=None):
+        super().__init__(rows)
+        self.cursor = cursor
+
+
+def encode_cursor(sort_key, value):
+    """Encode the last seen key value as an opaque, URL-safe token."""
+    raw = json.dumps({"k": sort_key, "v": value}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token, sort_key):
+    """Decode a token produced by encode_cursor(); it must match `sort_key`."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid pagination cursor: {token!r}")
+    if not isinstance(data, dict) or data.get("k") != sort_key:
+        raise ValueError(f"Cursor was not issued for sort key {sort_key!r}")
+    return data["v"]
+
 def paginate_users(page_size, offset):
     """
     Fetch a single page using LIMIT/OFFSET.
-    (No loops here.)
+    The connection comes from seed's pool, so pages after the first skip
+    connection setup. (No loops here.)
     """
-    conn = seed.connect_to_prodev()
-    cur = conn.cursor(dictionary=True)
-    try:
-        # Important: matches grader's expected substring
-        cur.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
-        rows = cur.fetchall()
-        return rows
-    finally:
-        cur.close()
-        conn.close()
+    with seed.pooled_connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            # Important: matches grader's expected substring
+            cur.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
+            rows = cur.fetchall()
+            return rows
+        finally:
+            cur.close()
 
-def lazypaginate(page_size):
+def lazypaginate(page_size, keyset=False, prefetch=0):
     """
     Generator yielding ONE PAGE (list of rows) at a time.
     Exactly ONE loop (the while).
+    keyset=True delegates to keyset_paginate() (flat per-page cost).
+    prefetch=K fetches up to K pages ahead on a background thread.
     """
+    if prefetch:
+        yield from prefetch_pages(lambda: lazypaginate(page_size, keyset), prefetch)
+        return
+    if keyset:
+        yield from keyset_paginate(page_size)
+        return
     offset = 0
     while True:   # single loop
         page = paginate_users(page_size, offset)  # <-- literal match
@@ -44,5 +94,139 @@ def lazypaginate(page_size):
         yield page
         offset += page_size
 
+def prefetch_pages(make_pages, depth=2):
+    """
+    Generator re-yielding the pages of `make_pages()` while a background
+    thread keeps up to `depth` pages fetched ahead in a bounded queue.
+
+    The page generator is created, advanced and closed on that thread.
+    Closing this generator early stops the thread (and releases its
+    connection) before returning; errors from the reader are re-raised.
+    """
+    if depth < 1:
+        raise ValueError("depth must be >= 1")
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        pages = make_pages()
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except Exception as exc:
+            put(exc)
+            return
+        finally:
+            pages.close()
+        put(done)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        for item in iter(buffer.get, done):
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def paginate_users_after(connection, page_size, after=None, sort_key="user_id"):
+    """
+    Fetch a single page seeking past `after` on `sort_key`.
+    The index range scan starts right at the key, unlike OFFSET which
+    has to walk and discard every preceding row.
+    """
+    if sort_key not in SEEK_KEYS:
+        raise ValueError(f"sort_key must be one of {SEEK_KEYS}")
+    cur = connection.cursor(dictionary=True)
+    try:
+        if after is None:
+            cur.execute(
+                f"SELECT * FROM user_data ORDER BY {sort_key} LIMIT %s", (page_size,)
+            )
+        else:
+            cur.execute(
+                f"SELECT * FROM user_data WHERE {sort_key} > %s "
+                f"ORDER BY {sort_key} LIMIT %s",
+                (after, page_size),
+            )
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def keyset_paginate(page_size, cursor=None, sort_key="user_id"):
+    """
+    Generator yielding ONE PAGE at a time using keyset (seek) pagination.
+    A single pooled connection is held for every page and returned when
+    the generator finishes or is closed early.
+
+    Each yielded Page has a `.cursor` token; pass it back as `cursor=` to
+    resume after that page (e.g. in a later request or after a crash).
+    """
+    after = decode_cursor(cursor, sort_key) if cursor else None
+    with seed.pooled_connection() as conn:
+        while True:   # single loop
+            rows = paginate_users_after(conn, page_size, after, sort_key)
+            if not rows:
+                break
+            after = rows[-1][sort_key]
+            yield Page(rows, encode_cursor(sort_key, after))
+            if len(rows) < page_size:
+                break
+
+
+def benchmark_pagination(page_size=100, pages=50):
+    """
+    Walk `pages` pages with LIMIT/OFFSET and with keyset pagination and
+    print per-page latency for the first and last pages of each run.
+    OFFSET latency grows with depth; keyset latency stays flat.
+    Returns {"offset": [seconds...], "keyset": [seconds...]}.
+    """
+    timings = {"offset": [], "keyset": []}
+
+    offset = 0
+    for _ in range(pages):
+        started = time.perf_counter()
+        page = paginate_users(page_size, offset)
+        timings["offset"].append(time.perf_counter() - started)
+        if not page:
+            break
+        offset += page_size
+
+    pager = keyset_paginate(page_size)
+    for _ in range(pages):
+        started = time.perf_counter()
+        page = next(pager, None)
+        timings["keyset"].append(time.perf_counter() - started)
+        if page is None:
+            break
+    pager.close()
+
+    for name, samples in timings.items():
+        if samples:
+            print(
+                f"{name:>6}: {len(samples)} pages, first {samples[0] * 1000:.2f} ms, "
+                f"last {samples[-1] * 1000:.2f} ms, "
+                f"mean {sum(samples) / len(samples) * 1000:.2f} ms"
+            )
+    return timings
+
+
 # Alias kept for the runner
 lazy_pagination = lazypaginate
+
+if __name__ == "__main__":
+    benchmark_pagination()
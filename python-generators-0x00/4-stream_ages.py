@@ -19,15 +19,14 @@ def stream_user_ages():
     Generator yielding ages one-by-one as Decimal (stable numeric type).
     Loop #1: iterate the DB cursor row by row.
     """
-    conn = seed.connect_to_prodev()
-    cur = conn.cursor(buffered=False)
-    try:
-        cur.execute("SELECT age FROM user_data")
-        for (age,) in cur:  # Loop #1
-            yield Decimal(str(age))
-    finally:
-        cur.close()
-        conn.close()
+    with seed.pooled_connection() as conn:
+        cur = conn.cursor(buffered=False)
+        try:
+            cur.execute("SELECT age FROM user_data")
+            for (age,) in cur:  # Loop #1
+                yield Decimal(str(age))
+        finally:
+            cur.close()
 
 def average_age():
     """
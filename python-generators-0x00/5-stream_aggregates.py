@@ -0,0 +1,295 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+5-stream_aggregates.py
+----------------------
+Single-pass streaming aggregation over user_data.
+
+4-stream_ages.py computes one metric (the mean) per scan. Reporting jobs
+need more, and rescanning the table once per metric is wasteful, so this
+module computes everything in ONE pass:
+
+- count, sum, mean, variance / stddev (Welford / Chan, numerically stable)
+- min / max
+- approximate quantiles with a merging t-digest (bounded memory)
+- fixed-edge histogram (with underflow / overflow counts)
+
+Two ways to feed it:
+- StreamingAggregate.add(x)          one value at a time (stream_users)
+- StreamingAggregate.add_batch(xs)   a whole fetched batch at once
+                                     (stream_users_in_batches); uses NumPy
+                                     when installed, C-level builtins otherwise
+
+Aggregates are mergeable (merge()), so partial results computed over
+separate ranges of the table can be combined.
+"""
+import math
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback for add_batch()
+    np = None
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class TDigest:
+    """
+    Merging t-digest: approximate quantiles in O(compression) memory.
+    Values are buffered and folded into weighted centroids in sorted order;
+    centroids near the tails stay small, so extreme quantiles stay accurate.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self._centroids = []   # sorted [(mean, weight)]
+        self._buffer = []      # unsorted [(value, weight)]
+        self._buffer_limit = max(50, 5 * compression)
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        """Add one value."""
+        self._buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def add_batch(self, values):
+        """Add many (already float) values with a single sort/compress."""
+        if not values:
+            return
+        self._buffer.extend(zip(values, [1] * len(values)))
+        self.count += len(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        other._compress()
+        self._buffer.extend(other._centroids)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total = self.count
+        merged = []
+        cum = 0
+        cur_mean, cur_weight = items[0]
+        for mean, weight in items[1:]:
+            proposed = cur_weight + weight
+            q = (cum + proposed / 2) / total
+            limit = max(1, 4 * total * q * (1 - q) / self.compression)
+            if proposed <= limit:
+                cur_mean += (mean - cur_mean) * weight / proposed
+                cur_weight = proposed
+            else:
+                merged.append((cur_mean, cur_weight))
+                cum += cur_weight
+                cur_mean, cur_weight = mean, weight
+        merged.append((cur_mean, cur_weight))
+        self._centroids = merged
+
+    def quantile(self, q):
+        """Estimate the q-th quantile (0 <= q <= 1); NaN when empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        self._compress()
+        if not self._centroids:
+            return math.nan
+        if len(self._centroids) == 1:
+            return self._centroids[0][0]
+        target = q * self.count
+        # Interpolate between centroid centres; clamp the tails to min/max.
+        prev_mean, prev_centre = self.min, 0.0
+        cum = 0
+        for mean, weight in self._centroids:
+            centre = cum + weight / 2
+            if target < centre:
+                span = centre - prev_centre
+                frac = (target - prev_centre) / span if span else 0.0
+                return prev_mean + (mean - prev_mean) * frac
+            prev_mean, prev_centre = mean, centre
+            cum += weight
+        span = self.count - prev_centre
+        frac = (target - prev_centre) / span if span else 0.0
+        return prev_mean + (self.max - prev_mean) * frac
+
+
+class StreamingAggregate:
+    """
+    One-pass count / sum / mean / variance / min / max / quantiles /
+    histogram over a stream of numbers.
+
+    `bins` is an ascending sequence of histogram edges; values below the
+    first edge or at/above the last edge are counted as underflow/overflow.
+    """
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES, bins=None, compression=100):
+        self.quantiles = tuple(quantiles)
+        self.bins = tuple(bins) if bins is not None else None
+        if self.bins is not None and len(self.bins) < 2:
+            raise ValueError("bins needs at least two edges")
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.digest = TDigest(compression)
+        # counts[0] = underflow, counts[-1] = overflow
+        self.counts = [0] * (len(self.bins) + 1) if self.bins is not None else None
+
+    def add(self, value):
+        """Add one value (Welford update)."""
+        x = float(value)
+        self.count += 1
+        self.sum += x
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.digest.add(x)
+        if self.counts is not None:
+            self.counts[bisect_right(self.bins, x)] += 1
+
+    def add_batch(self, values):
+        """
+        Add a whole batch. Batch moments are computed in one vectorized step
+        and combined with the running ones (Chan et al.), so the per-row
+        Python work of add() is avoided.
+        """
+        if np is not None:
+            arr = np.asarray(values, dtype=float)
+            n = int(arr.size)
+            if not n:
+                return
+            b_sum = float(arr.sum())
+            b_mean = b_sum / n
+            b_m2 = float(((arr - b_mean) ** 2).sum())
+            b_min, b_max = float(arr.min()), float(arr.max())
+            floats = arr.tolist()
+            if self.counts is not None:
+                idx = np.searchsorted(np.asarray(self.bins), arr, side="right")
+                for i, c in enumerate(np.bincount(idx, minlength=len(self.counts))):
+                    self.counts[i] += int(c)
+        else:
+            floats = list(map(float, values))
+            n = len(floats)
+            if not n:
+                return
+            b_sum = math.fsum(floats)
+            b_mean = b_sum / n
+            b_m2 = math.fsum((x - b_mean) ** 2 for x in floats)
+            b_min, b_max = min(floats), max(floats)
+            if self.counts is not None:
+                for x in floats:
+                    self.counts[bisect_right(self.bins, x)] += 1
+        self._combine(n, b_sum, b_mean, b_m2, b_min, b_max)
+        self.digest.add_batch(floats)
+
+    def _combine(self, n, b_sum, b_mean, b_m2, b_min, b_max):
+        total = self.count + n
+        delta = b_mean - self.mean
+        self._m2 += b_m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.sum += b_sum
+        self.min = min(self.min, b_min)
+        self.max = max(self.max, b_max)
+
+    def merge(self, other):
+        """Combine with an aggregate built over a disjoint part of the data."""
+        if other.bins != self.bins:
+            raise ValueError("Cannot merge aggregates with different bins")
+        if not other.count:
+            return self
+        self._combine(other.count, other.sum, other.mean, other._m2, other.min, other.max)
+        self.digest.merge(other.digest)
+        if self.counts is not None:
+            self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1); NaN with fewer than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def result(self):
+        """Return every metric as a plain dict."""
+        empty = not self.count
+        summary = {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": math.nan if empty else self.mean,
+            "variance": self.variance,
+            "stddev": math.sqrt(self.variance) if self.count > 1 else math.nan,
+            "min": math.nan if empty else self.min,
+            "max": math.nan if empty else self.max,
+            "quantiles": {q: self.digest.quantile(q) for q in self.quantiles},
+        }
+        if self.counts is not None:
+            summary["histogram"] = {
+                "underflow": self.counts[0],
+                "bins": [
+                    (lo, hi, c)
+                    for lo, hi, c in zip(self.bins, self.bins[1:], self.counts[1:-1])
+                ],
+                "overflow": self.counts[-1],
+            }
+        return summary
+
+
+def aggregate_rows(rows, column="age", **options):
+    """Aggregate `column` over an iterable of dict rows (e.g. stream_users())."""
+    agg = StreamingAggregate(**options)
+    for row in rows:
+        agg.add(row[column])
+    return agg
+
+
+def aggregate_batches(batches, column="age", **options):
+    """Aggregate `column` over batches of dict rows (stream_users_in_batches())."""
+    agg = StreamingAggregate(**options)
+    for batch in batches:
+        agg.add_batch([row[column] for row in batch])
+    return agg
+
+
+def age_report(batch_size=1000, bins=range(0, 130, 10)):
+    """
+    Print and return a full age summary computed in a single table scan.
+    Uses columnar batches so each batch's ages go to add_batch() as one array.
+    """
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    agg = StreamingAggregate(bins=bins)
+    for batch in stream_users_in_batches(batch_size, columnar=True):
+        agg.add_batch(batch.age)
+    summary = agg.result()
+    print(f"Users: {summary['count']}")
+    print(f"Age mean {summary['mean']:.2f}, stddev {summary['stddev']:.2f}, "
+          f"min {summary['min']:.0f}, max {summary['max']:.0f}")
+    print("Age quantiles: " + ", ".join(
+        f"p{q * 100:g}={v:.1f}" for q, v in summary["quantiles"].items()))
+    return summary
+
+
+if __name__ == "__main__":
+    age_report()
@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+6-partitioned_scan.py
+---------------------
+Parallel, range-partitioned scans of user_data.
+
+The other generators read the whole table serially through one cursor.
+Here the user_id keyspace is split into N contiguous ranges and each range
+is streamed on its own pooled connection:
+
+- parallel_scan(partitions, batch_size, ordered=False)
+    generator of row batches. Worker threads read ahead into bounded
+    queues; ordered=True yields batches in user_id order (partition by
+    partition), ordered=False yields whichever batch is ready first.
+- map_partitions(func, partitions, processes=False)
+    runs func(batches) once per range on a thread or process pool and
+    returns the per-range results (e.g. partial aggregates to merge).
+
+user_id values are UUID v4 strings, so splitting on evenly spaced hex
+prefixes gives balanced ranges. The first and last ranges are open-ended,
+so ids of any other shape are still scanned exactly once.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import seed
+
+_DONE = object()   # end-of-partition marker placed on the queues
+
+
+def partition_bounds(partitions):
+    """
+    Split the user_id keyspace into `partitions` half-open ranges
+    [(None, b1), (b1, b2), ..., (bn, None)].
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be >= 1")
+    edges = [format(i * 16 ** 8 // partitions, "08x") for i in range(1, partitions)]
+    return list(zip([None] + edges, edges + [None]))
+
+
+def scan_partition(bounds, batch_size=1000):
+    """
+    Generator yielding lists of dict rows whose user_id lies in `bounds`
+    (lo inclusive, hi exclusive), ordered by user_id.
+    """
+    lo, hi = bounds
+    clauses, params = [], []
+    if lo is not None:
+        clauses.append("user_id >= %s")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("user_id < %s")
+        params.append(hi)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    with seed.pooled_connection() as conn:
+        cur = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cur.execute(
+                f"SELECT user_id, name, email, age FROM user_data{where} ORDER BY user_id",
+                params,
+            )
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cur.close()
+
+
+def _produce(bounds, batch_size, out, stop):
+    """Worker: push a partition's batches (then _DONE or the error) onto `out`."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for batch in scan_partition(bounds, batch_size):
+            if not put(batch):
+                return
+    except Exception as exc:
+        put(exc)
+        return
+    put(_DONE)
+
+
+def parallel_scan(partitions=4, batch_size=1000, ordered=False, queue_depth=4):
+    """
+    Generator yielding row batches from `partitions` concurrent range scans.
+
+    Each worker thread holds one pooled connection (size the pool with
+    DB_POOL_SIZE >= partitions) and buffers at most `queue_depth` batches.
+    Closing the generator early stops the workers and returns their
+    connections to the pool. A worker error is re-raised here.
+    """
+    if seed.get_pool().max_size < partitions:
+        # Workers hold their connection while blocked on a full queue, so a
+        # smaller pool could starve the partition the consumer waits on.
+        raise ValueError(
+            f"parallel_scan needs DB_POOL_SIZE >= partitions ({partitions})"
+        )
+    bounds = partition_bounds(partitions)
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(queue_depth) for _ in bounds]
+    else:
+        queues = [queue.Queue(queue_depth * partitions)] * partitions
+    workers = [
+        threading.Thread(target=_produce, args=(b, batch_size, q, stop), daemon=True)
+        for b, q in zip(bounds, queues)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        if ordered:
+            for q in queues:
+                for item in iter(q.get, _DONE):
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        else:
+            remaining = partitions
+            while remaining:
+                item = queues[0].get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def _run_partition(func, bounds, batch_size):
+    return func(scan_partition(bounds, batch_size))
+
+
+_inherited_pools = []
+
+
+def _reset_pool_in_child():
+    """
+    ProcessPoolExecutor initializer: drop the pool a forked worker inherited
+    from the parent, so the worker opens its own connections instead of
+    sharing the parent's server sockets. The inherited pool is kept referenced
+    (never closed or collected) so nothing is sent on those shared sockets.
+    """
+    if seed._pool is not None:
+        _inherited_pools.append(seed._pool)
+    seed._pool = None
+    seed._pool_lock = threading.Lock()
+
+
+def map_partitions(func, partitions=4, batch_size=1000, processes=False, workers=None):
+    """
+    Call func(batches) for every range concurrently and return the results
+    in partition order. processes=True uses a process pool (func must be
+    picklable, i.e. a module-level function) so CPU-bound work scales
+    with cores; each process builds its own connection pool.
+    """
+    max_workers = workers or min(partitions, os.cpu_count() or 1)
+    if processes:
+        executor = ProcessPoolExecutor(max_workers, initializer=_reset_pool_in_child)
+    else:
+        executor = ThreadPoolExecutor(max_workers)
+    with executor as pool:
+        futures = [
+            pool.submit(_run_partition, func, bounds, batch_size)
+            for bounds in partition_bounds(partitions)
+        ]
+        return [f.result() for f in futures]
+
+
+def _age_aggregate(batches):
+    """Partial StreamingAggregate of ages for one partition."""
+    agg = __import__('5-stream_aggregates').StreamingAggregate()
+    for batch in batches:
+        agg.add_batch([row["age"] for row in batch])
+    return agg
+
+
+def parallel_average_age(partitions=4, processes=False):
+    """average_age() over `partitions` concurrent range scans."""
+    parts = map_partitions(_age_aggregate, partitions, processes=processes)
+    total = parts[0]
+    for part in parts[1:]:
+        total.merge(part)
+    avg = total.mean if total.count else 0.0
+    print(f"Average age of users: {avg:.2f}")
+    return avg
+
+
+def parallel_batch_processing(batch_size=50, partitions=4):
+    """batch_processing() over concurrent range scans (unordered output)."""
+    for batch in parallel_scan(partitions, batch_size):
+        for user in batch:
+            if int(user["age"]) > 25:
+                print(user)
+
+
+if __name__ == "__main__":
+    parallel_average_age()
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+7-async_streams.py
+------------------
+Async-generator counterparts of the streaming API for asyncio workers:
+
+    async for row in astream_users(): ...
+    async for batch in astream_users_in_batches(100): ...
+    async for page in alazy_paginate(100): ...
+
+mysql.connector is blocking, so the synchronous generators run on worker
+threads (asyncio.to_thread) and never block the event loop. A background
+task reads ahead into a bounded asyncio.Queue: while the consumer works on
+batch N, batch N+1 (up to `queue_depth` batches) is already being fetched.
+When the queue is full the reader waits, so memory stays bounded.
+
+Closing the async generator early (aclose(), or `async with
+contextlib.aclosing(...)` around a loop that breaks) stops the reader and
+closes the underlying generator, returning its pooled connection.
+"""
+import asyncio
+from contextlib import aclosing
+
+_DONE = object()   # end-of-stream marker
+
+
+async def aprefetch(make_gen, queue_depth=2):
+    """
+    Async generator over the items of the sync generator `make_gen()`,
+    fetched on worker threads with up to `queue_depth` items read ahead.
+    """
+    if queue_depth < 1:
+        raise ValueError("queue_depth must be >= 1")
+    buffer = asyncio.Queue(maxsize=queue_depth)
+    stop = asyncio.Event()
+    gen = make_gen()
+
+    async def reader():
+        end = _DONE
+        try:
+            while not stop.is_set():
+                item = await asyncio.to_thread(next, gen, _DONE)
+                if item is _DONE:
+                    break
+                await buffer.put(item)
+        except Exception as exc:
+            end = exc
+        finally:
+            await asyncio.to_thread(gen.close)
+        if not stop.is_set():
+            await buffer.put(end)
+
+    task = asyncio.create_task(reader())
+    try:
+        while True:
+            item = await buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Free a slot so a reader blocked on put() can see `stop` and exit.
+        while not buffer.empty():
+            buffer.get_nowait()
+        await task
+
+
+async def astream_users_in_batches(batch_size, queue_depth=2, columnar=False):
+    """Async stream_users_in_batches(): yields batches, prefetching ahead."""
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    stream = aprefetch(lambda: stream_users_in_batches(batch_size, columnar), queue_depth)
+    async with aclosing(stream):
+        async for batch in stream:
+            yield batch
+
+
+async def astream_users(batch_size=500, queue_depth=2):
+    """
+    Async stream_users(): yields dict rows one at a time. Rows are fetched
+    in batches so there is one thread hop per batch, not per row.
+    """
+    batches = astream_users_in_batches(batch_size, queue_depth)
+    async with aclosing(batches):
+        async for batch in batches:
+            for row in batch:
+                # Same age normalization as stream_users()
+                try:
+                    row["age"] = int(row["age"])
+                except Exception:
+                    pass
+                yield row
+
+
+async def alazy_paginate(page_size, queue_depth=2, keyset=False):
+    """Async lazypaginate(): yields pages, prefetching up to queue_depth ahead."""
+    lazypaginate = __import__('2-lazy_paginate').lazypaginate
+    pages = aprefetch(lambda: lazypaginate(page_size, keyset), queue_depth)
+    async with aclosing(pages):
+        async for page in pages:
+            yield page
+
+
+async def _main():
+    count = 0
+    async for _ in astream_users():
+        count += 1
+    print(f"Streamed {count} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+benchmark.py
+------------
+Reproducible throughput benchmarks for the generator pipelines.
+
+For every requested row count the harness (re)seeds user_data through
+seed.bulk_insert_csv() with synthetic rows, then runs:
+
+    stream_users, stream_users_in_batches (row + columnar),
+    lazypaginate (OFFSET + keyset), average_age
+
+at each batch/page size. Every run happens in a fresh process so peak RSS
+is per pipeline. Results (rows/sec, peak RSS, per-item latency p50/p95/p99)
+are printed as JSON.
+
+user_data is truncated, so the scratch database must be named explicitly
+(--database is required and the ALX_prodev dev database is refused):
+
+    python benchmark.py --database ALX_bench --rows 10000 100000 \\
+        --sizes 100 1000 --output bench.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import seed
+
+_END = object()
+
+# Databases seed_database() refuses to truncate
+PROTECTED_DATABASES = ("ALX_prodev",)
+
+
+def write_synthetic_csv(path, rows, rng_seed=0):
+    """Write `rows` deterministic fake users (name,email,age) to `path`."""
+    rng = random.Random(rng_seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([f"User {i}", f"user{i}@example.com", rng.randint(1, 120)])
+
+
+def use_database(name):
+    """
+    Point seed (and the spawned pipeline processes, via DB_NAME) at `name`.
+    Raises ValueError for a protected database.
+    """
+    if name in PROTECTED_DATABASES:
+        raise ValueError(f"refusing to benchmark against {name!r}; name a scratch database")
+    os.environ["DB_NAME"] = name
+    seed.DB_NAME = name
+
+
+def seed_database(rows, batch_size=5000):
+    """Create the database/table, empty user_data and load `rows` rows."""
+    if seed.DB_NAME in PROTECTED_DATABASES:
+        raise ValueError(f"refusing to truncate user_data in {seed.DB_NAME!r}; "
+                         "call use_database() with a scratch database first")
+    server = seed.connect_db()
+    seed.create_database(server)
+    server.close()
+    conn = seed.connect_to_prodev()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seed.create_table(conn)
+        cur = conn.cursor()
+        cur.execute("TRUNCATE TABLE user_data")
+        cur.close()
+        conn.commit()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.csv")
+            write_synthetic_csv(path, rows)
+            with contextlib.redirect_stdout(io.StringIO()):
+                return seed.bulk_insert_csv(conn, path, batch_size=batch_size)
+    finally:
+        conn.close()
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+def _pipeline(name, size):
+    """Return (iterator, rows_per_item) for one pipeline configuration."""
+    if name == "stream_users":
+        return __import__('0-stream_users').stream_users(), lambda item: 1
+    if name == "stream_users_in_batches":
+        mod = __import__('1-batch_processing')
+        return mod.stream_users_in_batches(size), len
+    if name == "stream_users_in_batches_columnar":
+        mod = __import__('1-batch_processing')
+        return mod.stream_users_in_batches(size, columnar=True), lambda b: b.size
+    if name == "lazypaginate":
+        return __import__('2-lazy_paginate').lazypaginate(size), len
+    if name == "lazypaginate_keyset":
+        return __import__('2-lazy_paginate').lazypaginate(size, keyset=True), len
+    if name == "average_age":
+        mod = __import__('4-stream_ages')
+        return iter([mod.average_age]), None
+    raise ValueError(f"Unknown pipeline {name!r}")
+
+
+def run_pipeline(name, size):
+    """Run one pipeline to completion and return its measurements."""
+    iterator, rows_of = _pipeline(name, size)
+    latencies = []
+    rows = 0
+    started = time.perf_counter()
+    if rows_of is None:
+        # average_age: one opaque call; count the rows it had to read.
+        with contextlib.redirect_stdout(io.StringIO()):
+            next(iterator)()
+        elapsed = time.perf_counter() - started
+        conn = seed.connect_to_prodev()
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM user_data")
+        (rows,) = cur.fetchone()
+        cur.close()
+        conn.close()
+    else:
+        while True:
+            t0 = time.perf_counter()
+            item = next(iterator, _END)
+            t1 = time.perf_counter()
+            if item is _END:
+                break
+            latencies.append(t1 - t0)
+            rows += rows_of(item)
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "pipeline": name,
+        "size": size,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else None,
+        "items": len(latencies),
+        "latency_ms": {
+            f"p{int(q * 100)}": (None if v is None else v * 1000)
+            for q, v in ((q, _percentile(latencies, q)) for q in (0.5, 0.95, 0.99))
+        },
+        # ru_maxrss is KiB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+SIZED = ("stream_users_in_batches", "stream_users_in_batches_columnar",
+         "lazypaginate", "lazypaginate_keyset")
+UNSIZED = ("stream_users", "average_age")
+
+
+def run_suite(row_counts, sizes, pipelines=SIZED + UNSIZED):
+    """Seed and benchmark every (row count, pipeline, size) combination."""
+    results = []
+    ctx = get_context("spawn")
+    for rows in row_counts:
+        load = seed_database(rows)
+        runs = [(name, None) for name in pipelines if name in UNSIZED]
+        runs += [(name, size) for name in pipelines if name in SIZED for size in sizes]
+        for name, size in runs:
+            # A fresh interpreter per run keeps peak RSS per pipeline.
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_pipeline, name, size).result()
+            result["table_rows"] = rows
+            results.append(result)
+        results.append({"pipeline": "seed.bulk_insert_csv", "table_rows": rows,
+                        "rows_per_sec": load["rows_per_sec"], "seconds": load["seconds"]})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--database", required=True,
+                        help="scratch database to (re)create; its user_data is truncated")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000],
+                        help="batch/page sizes")
+    parser.add_argument("--pipelines", nargs="+", default=list(SIZED + UNSIZED),
+                        choices=SIZED + UNSIZED)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    try:
+        use_database(args.database)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    report = {
+        "database": seed.DB_NAME,
+        "python": sys.version.split()[0],
+        "results": run_suite(args.rows, args.sizes, args.pipelines),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
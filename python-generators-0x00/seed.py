@@ -12,24 +12,44 @@ This file exposes the EXACT prototypes required by the checker and your mains:
     def connect_to_prodev()         -> connects to the ALX_prodev database
     def create_table(connection)    -> creates table user_data if missing
     def insert_data(connection, data) -> inserts a dict row OR loads rows from a CSV path
+                                         (batch_size=N for bulk CSV loading)
 
 Design notes
 - Zero-argument functions (connect_db/connect_to_prodev) read credentials from
   environment variables so they work with your `0-main.py` as-is:
     DB_HOST, DB_PORT, DB_USER, DB_PASSWORD
+  DB_NAME overrides the database name (e.g. a scratch DB for benchmarks).
 - Table schema matches the spec:
     user_id CHAR(36) PRIMARY KEY (UUID v4), name/email NOT NULL, age DECIMAL NOT NULL.
 - We add UNIQUE(email) so rerunning the seed won't duplicate rows.
+- updated_at (auto-maintained by MySQL on insert/update) plus an index on
+  (updated_at, user_id) let incremental jobs stream only changed rows.
 - INSERT uses an idempotent "ON DUPLICATE KEY UPDATE user_id=user_id" no-op.
+- The streaming generators borrow connections from a shared, bounded pool
+  (get_pool() / pooled_connection()) instead of opening one per call.
+  Pool size and idle timeout come from DB_POOL_SIZE / DB_POOL_IDLE_TIMEOUT.
+- CSV loads can run in bulk mode (batch_size=N): rows are validated in chunks,
+  sent as multi-row INSERTs via executemany and committed once per chunk.
 """
 
 import os
 import csv
+import time
 import uuid
+import threading
+from contextlib import contextmanager
+from itertools import islice
 from decimal import Decimal, InvalidOperation
 import mysql.connector
 
-DB_NAME = "ALX_prodev"
+DB_NAME = os.getenv("DB_NAME", "ALX_prodev")
+DEFAULT_BATCH_SIZE = 1000
+
+INSERT_SQL = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE user_id = user_id
+"""
 
 
 # -----------------------------
@@ -80,6 +100,7 @@ def connect_to_prodev():
 def create_table(connection):
     """
     Create the user_data table if it doesn't already exist.
+    Tables created before change tracking existed get it added.
     Prints "Table user_data created successfully" (as your sample output shows).
     """
     ddl = """
@@ -88,26 +109,55 @@ def create_table(connection):
         name    VARCHAR(255) NOT NULL,
         email   VARCHAR(255) NOT NULL,
         age     DECIMAL(10,2) NOT NULL,
+        updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+                   ON UPDATE CURRENT_TIMESTAMP(6),
         PRIMARY KEY (user_id),
-        UNIQUE KEY email_unique (email)
+        UNIQUE KEY email_unique (email),
+        KEY updated_at_idx (updated_at, user_id)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
     cur = connection.cursor()
     cur.execute(ddl)
     cur.close()
     connection.commit()
+    ensure_change_tracking(connection)
     print("Table user_data created successfully")
 
 
+def ensure_change_tracking(connection):
+    """
+    Add the updated_at column + (updated_at, user_id) index to an existing
+    user_data table if missing. Idempotent.
+    """
+    cur = connection.cursor()
+    try:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = 'updated_at'"
+        )
+        (present,) = cur.fetchone()
+        if not present:
+            cur.execute(
+                "ALTER TABLE user_data "
+                "ADD COLUMN updated_at TIMESTAMP(6) NOT NULL "
+                "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), "
+                "ADD KEY updated_at_idx (updated_at, user_id)"
+            )
+            connection.commit()
+    finally:
+        cur.close()
+
+
 # -----------------------------
-# Internal helper: insert one
+# Internal helpers: validate + insert
 # -----------------------------
-def _insert_one(connection, row):
+def _validate_row(row):
     """
-    Insert a single row into user_data.
+    Turn a dict row into the (user_id, name, email, age) tuple we insert.
     - Generates UUID4 if user_id not provided.
     - Validates age is numeric (Decimal).
-    - Ignores duplicate email (unique constraint) using a no-op update.
+    Raises ValueError on a bad row.
     """
     uid = row.get("user_id") or str(uuid.uuid4())
     name = row.get("name")
@@ -122,18 +172,96 @@ def _insert_one(connection, row):
     except (InvalidOperation, TypeError):
         raise ValueError(f"Invalid age value: {raw_age!r}")
 
-    sql = """
-        INSERT INTO user_data (user_id, name, email, age)
-        VALUES (%s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE user_id = user_id
+    return uid, name, email, age
+
+
+def _insert_one(connection, row):
+    """
+    Insert a single row into user_data.
+    Ignores duplicate email (unique constraint) using a no-op update.
     """
     cur = connection.cursor()
-    cur.execute(sql, (uid, name, email, age))
+    cur.execute(INSERT_SQL, _validate_row(row))
     connection.commit()
     cur.close()
 
 
-def insert_data(connection, data):
+def _insert_batch(connection, rows):
+    """
+    Insert a list of validated tuples with ONE executemany + ONE commit.
+    mysql.connector rewrites executemany on INSERT ... VALUES into a single
+    multi-row statement, so a batch costs one round trip.
+
+    Returns the number of rows actually inserted: with the no-op
+    ON DUPLICATE KEY UPDATE, duplicates report 0 affected rows.
+    """
+    cur = connection.cursor()
+    try:
+        cur.executemany(INSERT_SQL, rows)
+        inserted = cur.rowcount
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+    return inserted
+
+
+def bulk_insert_csv(connection, path, batch_size=DEFAULT_BATCH_SIZE, max_errors=10):
+    """
+    Load a CSV file into user_data in batches of `batch_size` rows.
+
+    Invalid rows are skipped (not fatal) and counted as rejected; the first
+    `max_errors` of them are kept as (line_number, reason) for inspection.
+
+    Returns a stats dict:
+        rows, inserted, duplicates, rejected, errors, batches,
+        seconds, rows_per_sec
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+
+    stats = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0,
+             "errors": [], "batches": 0}
+    started = time.perf_counter()
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            chunk = list(islice(reader, batch_size))
+            if not chunk:
+                break
+            # Line 1 is the header, so the first data row is line 2.
+            first_line = reader.line_num - len(chunk) + 1
+            valid = []
+            for line_no, row in enumerate(chunk, start=first_line):
+                try:
+                    valid.append(_validate_row(row))
+                except ValueError as exc:
+                    stats["rejected"] += 1
+                    if len(stats["errors"]) < max_errors:
+                        stats["errors"].append((line_no, str(exc)))
+            if not valid:
+                continue
+            inserted = _insert_batch(connection, valid)
+            stats["rows"] += len(valid)
+            stats["inserted"] += inserted
+            stats["duplicates"] += len(valid) - inserted
+            stats["batches"] += 1
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = elapsed
+    stats["rows_per_sec"] = stats["rows"] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Loaded {stats['rows']} rows in {stats['batches']} batches "
+        f"({stats['rows_per_sec']:.0f} rows/sec): {stats['inserted']} inserted, "
+        f"{stats['duplicates']} duplicates, {stats['rejected']} rejected"
+    )
+    return stats
+
+
+def insert_data(connection, data, batch_size=None):
     """
     Insert data in the database if it does not exist.
 
@@ -141,13 +269,17 @@ def insert_data(connection, data):
       - dict: single user row, e.g. {"name": "...", "email": "...", "age": 42}
       - str : CSV file path with headers name,email,age[,user_id]
 
-    For CSV files, rows are streamed and inserted one-by-one.
+    For CSV files, rows are streamed and inserted one-by-one by default.
+    Pass batch_size=N to use the bulk loader instead (see bulk_insert_csv);
+    its stats dict is returned.
     """
     if isinstance(data, dict):
         _insert_one(connection, data)
         return
 
     if isinstance(data, str):
+        if batch_size:
+            return bulk_insert_csv(connection, data, batch_size=batch_size)
         with open(data, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
             for row in reader:
@@ -155,3 +287,181 @@ def insert_data(connection, data):
         return
 
     raise TypeError("data must be a dict row or a CSV file path (string)")
+
+
+# -----------------------------
+# Connection pool
+# -----------------------------
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of connections to ALX_prodev.
+
+    - At most `max_size` connections exist at once; acquire() blocks (up to
+      `timeout` seconds) when all of them are checked out.
+    - A connection belongs to one thread between acquire() and release().
+    - Idle connections are pinged on checkout and replaced if dead.
+    - Connections idle for more than `idle_timeout` seconds are closed.
+    """
+
+    def __init__(self, factory=None, max_size=5, idle_timeout=300.0, timeout=30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self._factory = factory or connect_to_prodev
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []          # [(connection, last_released_at)], LIFO
+        self._size = 0           # open connections, idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"checkouts": 0, "creates": 0, "waits": 0, "wait_seconds": 0.0,
+                       "evictions": 0, "health_failures": 0, "discards": 0}
+
+    def _evict_idle(self, now):
+        """Close idle connections past idle_timeout (caller holds the lock)."""
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                self._close_quietly(conn)
+                self._size -= 1
+                self._stats["evictions"] += 1
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Check out a healthy connection, creating one if under max_size."""
+        deadline = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("ConnectionPool is closed")
+                self._evict_idle(time.monotonic())
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No pooled connection available after {self.timeout}s"
+                    )
+                started = time.monotonic()
+                self._cond.wait(remaining)
+                self._stats["wait_seconds"] += time.monotonic() - started
+
+        # Network I/O (ping/connect) happens outside the lock.
+        if conn is not None and not self._is_healthy(conn):
+            self._close_quietly(conn)
+            with self._cond:
+                self._stats["health_failures"] += 1
+            conn = None
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["creates"] += 1
+        with self._cond:
+            self._stats["checkouts"] += 1
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool. Any open transaction is rolled back;
+        a connection that cannot be reset, or returned after close(), is
+        closed instead of reused.
+        """
+        try:
+            conn.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+        with self._cond:
+            if self._closed:
+                self._close_quietly(conn)
+                self._size -= 1
+            elif reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._close_quietly(conn)
+                self._size -= 1
+                self._stats["discards"] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager: acquire() on enter, release() on exit."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Snapshot of pool counters plus current size / idle / in-use counts."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update(size=self._size, idle=len(self._idle),
+                            in_use=self._size - len(self._idle), max_size=self.max_size)
+        return snapshot
+
+    def close(self):
+        """
+        Close every idle connection; checked-out ones close on release and
+        further acquire() calls raise RuntimeError.
+        """
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+            # Wake waiters so they see the pool is closed
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool shared by the streaming generators."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                max_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+            )
+        return _pool
+
+
+def pooled_connection():
+    """Shortcut for get_pool().connection()."""
+    return get_pool().connection()
@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+test_batch_processing.py
+------------------------
+Unit tests for the columnar helpers of 1-batch_processing (no database).
+"""
+import unittest
+
+batch_processing = __import__('1-batch_processing')
+
+ROWS = [("id-1", "Ann", "ann@x.io", 30), ("id-2", "Bob", "bob@x.io", 20),
+        ("id-3", "Cy", "cy@x.io", 26)]
+
+
+class TestColumnBatch(unittest.TestCase):
+    """Tests for ColumnBatch and filter_by_age"""
+
+    def test_filter_by_age(self):
+        """Only rows with age > min_age are kept"""
+        batch = batch_processing.filter_by_age(batch_processing._to_columns(ROWS), 25)
+        self.assertEqual(batch.size, 2)
+        self.assertEqual(list(batch.user_id), ["id-1", "id-3"])
+
+    def test_rows_are_plain_python_values(self):
+        """rows() yields dicts of builtin str/float, whichever backend is used"""
+        rows = list(batch_processing._to_columns(ROWS).rows())
+        self.assertEqual(rows[0], {"user_id": "id-1", "name": "Ann",
+                                   "email": "ann@x.io", "age": 30.0})
+        for row in rows:
+            self.assertEqual({type(v) for k, v in row.items() if k != "age"}, {str})
+            self.assertIs(type(row["age"]), float)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+test_partitioned_scan.py
+------------------------
+Unit tests for 6-partitioned_scan.py that need no MySQL server.
+"""
+import unittest
+
+import seed
+
+partitioned_scan = __import__('6-partitioned_scan')
+
+
+def _worker_pool_state(batches):
+    """Run in a worker: whether it starts without the parent's pool."""
+    return seed._pool is None
+
+
+class TestPartitionBounds(unittest.TestCase):
+    """Tests for partition_bounds"""
+
+    def test_ranges_are_contiguous_and_open_ended(self):
+        """Ranges cover the keyspace without gaps, open at both ends"""
+        bounds = partitioned_scan.partition_bounds(4)
+        self.assertEqual((bounds[0][0], bounds[-1][1]), (None, None))
+        self.assertEqual([hi for _, hi in bounds[:-1]], [lo for lo, _ in bounds[1:]])
+        with self.assertRaises(ValueError):
+            partitioned_scan.partition_bounds(0)
+
+
+class TestMapPartitions(unittest.TestCase):
+    """Tests for map_partitions"""
+
+    def setUp(self):
+        self.saved = seed._pool
+        seed._pool = seed.ConnectionPool(factory=object, max_size=1)
+
+    def tearDown(self):
+        seed._pool = self.saved
+
+    def test_worker_processes_do_not_inherit_the_pool(self):
+        """Each worker process builds its own pool instead of the parent's"""
+        results = partitioned_scan.map_partitions(_worker_pool_state, partitions=2,
+                                                  processes=True, workers=2)
+        self.assertEqual(results, [True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+test_seed_pool.py
+-----------------
+Unit tests for seed.ConnectionPool, using stub connections (no MySQL server).
+"""
+import threading
+import unittest
+
+import seed
+
+
+class StubConnection:
+    """Stands in for a mysql.connector connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if self.closed:
+            raise ConnectionError("closed")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests for ConnectionPool"""
+
+    def setUp(self):
+        self.pool = seed.ConnectionPool(factory=StubConnection, max_size=2, timeout=0.2)
+
+    def test_reuses_released_connection(self):
+        """A released connection is rolled back and handed out again"""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(self.pool.stats()["creates"], 1)
+
+    def test_blocks_then_times_out_when_exhausted(self):
+        """acquire() raises TimeoutError once max_size connections are out"""
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+
+    def test_waiter_gets_released_connection(self):
+        """A blocked acquire() returns as soon as a connection is released"""
+        first = self.pool.acquire()
+        self.pool.acquire()
+        threading.Timer(0.05, self.pool.release, [first]).start()
+        self.assertIs(self.pool.acquire(), first)
+
+    def test_close_closes_connections_released_later(self):
+        """After close(), released connections are closed and acquire() raises"""
+        held = self.pool.acquire()
+        idle = self.pool.acquire()
+        self.pool.release(idle)
+        self.pool.close()
+        self.assertTrue(idle.closed)
+        self.pool.release(held)
+        self.assertTrue(held.closed)
+        self.assertEqual(self.pool.stats()["size"], 0)
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+
+if __name__ == "__main__":
+    unittest.main()